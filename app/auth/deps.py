@@ -1,19 +1,20 @@
 import os
-import httpx
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Optional
 import uuid
 from core.config import settings
+from app.auth.tokens import JWKSFetcher, TokenVerifier
 
 security = HTTPBearer()
 
 # Load environment variables with validation
 SUPABASE_JWT_AUD = os.getenv("SUPABASE_JWT_AUD", "authenticated")
 SUPABASE_PROJECT_REF = os.getenv("SUPABASE_PROJECT_REF")
+# Legacy HS256 project secret; asymmetric (RS256/ES256) tokens use the JWKS
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
 # Check if Supabase is configured
 SUPABASE_CONFIGURED = bool(SUPABASE_PROJECT_REF and SUPABASE_PROJECT_REF != "<your-project-ref>")
@@ -26,6 +27,29 @@ else:
     SUPABASE_JWT_ISS = None
     SUPABASE_JWKS_URL = None
 
+# Tokens issued by this API (create_access_token)
+local_verifier = TokenVerifier("local", secret=settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+# Tokens issued by Supabase Auth
+jwks_fetcher = JWKSFetcher(SUPABASE_JWKS_URL) if SUPABASE_CONFIGURED else None
+supabase_verifier = TokenVerifier(
+    "supabase",
+    secret=SUPABASE_JWT_SECRET,
+    algorithms=(["HS256"] if SUPABASE_JWT_SECRET else []) + ["RS256", "ES256"],
+    jwks=jwks_fetcher,
+    audience=SUPABASE_JWT_AUD,
+    issuer=SUPABASE_JWT_ISS
+)
+
+async def start_auth():
+    """Load the Supabase JWKS and keep it refreshed in the background"""
+    if jwks_fetcher is not None:
+        jwks_fetcher.start()
+
+async def stop_auth():
+    if jwks_fetcher is not None:
+        await jwks_fetcher.stop()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -36,14 +60,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = await local_verifier.verify(credentials.credentials)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -55,43 +79,21 @@ def get_current_user(username: str = Depends(verify_token)):
     # You can add user validation logic here
     return username
 
-@lru_cache()
-def get_jwks():
-    if not SUPABASE_CONFIGURED:
-        return []
-    try:
-        resp = httpx.get(SUPABASE_JWKS_URL, timeout=10.0)
-        resp.raise_for_status()
-        return resp.json()["keys"]
-    except Exception as e:
-        print(f"Warning: Failed to fetch JWKS: {str(e)}")
-        return []
-
-def get_public_key(token):
-    jwks = get_jwks()
-    if not jwks:
-        return None
-    try:
-        unverified_header = jwt.get_unverified_header(token)
-        for key in jwks:
-            if key["kid"] == unverified_header["kid"]:
-                return jwt.construct_rsa_public_key(key)
-    except Exception as e:
-        print(f"Warning: Error constructing public key: {e}")
-    raise HTTPException(status_code=401, detail="Invalid token header")
-
 async def get_current_user_supabase(request: Request):
     auth = request.headers.get("Authorization")
     if not auth or not auth.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
     token = auth.split(" ", 1)[1]
     try:
-        # For dev, decode without verification, but require sub to be a UUID
-        payload = jwt.decode(
-            token,
-            key="",  # <-- required for python-jose
-            options={"verify_signature": False, "verify_aud": False, "verify_iss": False},
-        )
+        if SUPABASE_CONFIGURED:
+            payload = await supabase_verifier.verify(token)
+        else:
+            # For dev, decode without verification, but require sub to be a UUID
+            payload = jwt.decode(
+                token,
+                key="",  # <-- required for python-jose
+                options={"verify_signature": False, "verify_aud": False, "verify_iss": False},
+            )
         # Ensure sub is a valid UUID
         uuid.UUID(payload["sub"])
         return payload
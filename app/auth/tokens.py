@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from jose import jwt, JWTError
+
+from core.metrics import metrics
+from core.singleflight import SingleFlight
+
+# Verified token cache
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", 10000))
+# Tokens without an exp claim are re-verified after this many seconds
+AUTH_TOKEN_CACHE_MAX_AGE = float(os.getenv("AUTH_TOKEN_CACHE_MAX_AGE", 300))
+
+# JWKS refresh
+AUTH_JWKS_REFRESH_INTERVAL = float(os.getenv("AUTH_JWKS_REFRESH_INTERVAL", 600))
+# Floor between refetches triggered by an unknown kid
+AUTH_JWKS_MIN_REFETCH_INTERVAL = float(os.getenv("AUTH_JWKS_MIN_REFETCH_INTERVAL", 30))
+AUTH_JWKS_TIMEOUT = float(os.getenv("AUTH_JWKS_TIMEOUT", 10))
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified claims keyed by a SHA-256 of the token.
+
+    Entries expire at the token's own exp, so a cached token is never
+    accepted after it would have failed verification.
+    """
+
+    def __init__(self, max_entries: int = AUTH_TOKEN_CACHE_MAX_ENTRIES, max_age: float = AUTH_TOKEN_CACHE_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return claims
+
+    def set(self, token: str, claims: dict):
+        now = time.time()
+        exp = claims.get("exp")
+        expires_at = float(exp) if isinstance(exp, (int, float)) else now + self.max_age
+        if expires_at <= now:
+            return
+        key = self.key(token)
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class JWKSFetcher:
+    """Async JWKS client with periodic refresh and refetch on an unknown kid"""
+
+    def __init__(
+        self,
+        url: str,
+        refresh_interval: float = AUTH_JWKS_REFRESH_INTERVAL,
+        min_refetch_interval: float = AUTH_JWKS_MIN_REFETCH_INTERVAL
+    ):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.keys: Dict[str, dict] = {}
+        self.fetched_at = 0.0
+        self._flight = SingleFlight("jwks")
+        self._task: Optional[asyncio.Task] = None
+
+    async def _fetch(self) -> Dict[str, dict]:
+        async with httpx.AsyncClient(timeout=AUTH_JWKS_TIMEOUT) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            keys = {key["kid"]: key for key in response.json().get("keys", []) if key.get("kid")}
+        self.keys = keys
+        self.fetched_at = time.time()
+        metrics.incr("auth.jwks.fetches")
+        return keys
+
+    async def refresh(self) -> Dict[str, dict]:
+        """Fetch the key set now, sharing one request between concurrent callers"""
+        return await self._flight.do(self.url, self._fetch)
+
+    async def get_key(self, kid: str) -> Optional[dict]:
+        """Key for kid, refetching the set once if the kid is unknown (key rotation)"""
+        key = self.keys.get(kid)
+        if key is None and time.time() - self.fetched_at >= self.min_refetch_interval:
+            try:
+                key = (await self.refresh()).get(kid)
+            except Exception as e:
+                print(f"Warning: Failed to fetch JWKS: {e}")
+        return key
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Warning: Failed to refresh JWKS: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class TokenVerifier:
+    """Verifies JWTs and caches the claims of valid ones.
+
+    HMAC tokens are checked against ``secret``; asymmetric tokens (RS256,
+    ES256) against the JWKS key named by their kid.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        secret: Optional[str] = None,
+        algorithms: Optional[List[str]] = None,
+        jwks: Optional[JWKSFetcher] = None,
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None
+    ):
+        self.name = name
+        self.secret = secret
+        self.algorithms = algorithms or ["HS256"]
+        self.jwks = jwks
+        self.audience = audience
+        self.issuer = issuer
+        self.cache = VerifiedTokenCache()
+
+    async def _key_for(self, token: str):
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        if algorithm not in self.algorithms:
+            raise JWTError(f"Unsupported token algorithm: {algorithm}")
+        if algorithm.startswith("HS"):
+            if not self.secret:
+                raise JWTError("No secret configured for HMAC tokens")
+            return self.secret
+        if self.jwks is None:
+            raise JWTError("No JWKS configured for asymmetric tokens")
+        key = await self.jwks.get_key(header.get("kid", ""))
+        if key is None:
+            raise JWTError("Unknown signing key")
+        return key
+
+    async def verify(self, token: str) -> dict:
+        """Return the verified claims of token, raising JWTError if it is invalid"""
+        claims = self.cache.get(token)
+        if claims is not None:
+            metrics.incr(f"auth.{self.name}.cache_hits")
+            return claims
+        metrics.incr(f"auth.{self.name}.cache_misses")
+        started = time.perf_counter()
+        try:
+            claims = jwt.decode(
+                token,
+                await self._key_for(token),
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"verify_aud": self.audience is not None, "verify_iss": self.issuer is not None}
+            )
+        except JWTError:
+            metrics.incr(f"auth.{self.name}.failures")
+            raise
+        finally:
+            metrics.observe(f"auth.{self.name}.verify_seconds", time.perf_counter() - started)
+        self.cache.set(token, claims)
+        return claims
@@ -1,49 +1,50 @@
-import os
-from supabase import create_client, Client
 from app.flags.models import Flag, FlagCreate, FlagUpdate
+from core.cache import reference_cache
+from core.database import SupabaseRest, get_database
 from typing import List, Optional
 from uuid import UUID
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase URL or Key not set in environment variables")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 class FlagService:
-    @staticmethod
-    def get_flags() -> List[Flag]:
-        data, count, error = supabase.table("flags").select("*").execute()
-        if error:
-            raise Exception(error.message)
+    def __init__(self, db: Optional[SupabaseRest] = None):
+        self._db = db
+        # Small reference table: reads are served from memory, writes invalidate
+        self.cache = reference_cache("flags")
+
+    @property
+    def db(self) -> SupabaseRest:
+        return self._db or get_database()
+
+    async def _load_flags(self) -> List[Flag]:
+        data = await self.db.select("flags")
         return [Flag(**item) for item in data]
 
-    @staticmethod
-    def get_flag(flag_id: UUID) -> Optional[Flag]:
-        data, count, error = supabase.table("flags").select("*").eq("id", str(flag_id)).single().execute()
-        if error:
-            raise Exception(error.message)
+    async def _load_flag(self, flag_id: UUID) -> Flag:
+        data = await self.db.select("flags", {"id": f"eq.{flag_id}"}, single=True)
         return Flag(**data)
 
-    @staticmethod
-    def create_flag(flag: FlagCreate) -> Flag:
-        data, count, error = supabase.table("flags").insert(flag.dict()).execute()
-        if error:
-            raise Exception(error.message)
-        return Flag(**data[0])
-
-    @staticmethod
-    def update_flag(flag_id: UUID, flag: FlagUpdate) -> Flag:
-        data, count, error = supabase.table("flags").update(flag.dict(exclude_unset=True)).eq("id", str(flag_id)).execute()
-        if error:
-            raise Exception(error.message)
-        return Flag(**data[0])
-
-    @staticmethod
-    def delete_flag(flag_id: UUID):
-        data, count, error = supabase.table("flags").delete().eq("id", str(flag_id)).execute()
-        if error:
-            raise Exception(error.message)
+    async def get_flags(self) -> List[Flag]:
+        return list(await self.cache.get_or_load("all", self._load_flags))
+
+    async def get_flag(self, flag_id: UUID) -> Optional[Flag]:
+        return await self.cache.get_or_load(f"id:{flag_id}", lambda: self._load_flag(flag_id))
+
+    async def create_flag(self, flag: FlagCreate) -> Flag:
+        data = await self.db.insert("flags", flag.model_dump(mode="json"))
+        created = Flag(**data[0])
+        self.cache.invalidate()
+        self.cache.set(f"id:{created.id}", created)
+        return created
+
+    async def update_flag(self, flag_id: UUID, flag: FlagUpdate) -> Flag:
+        data = await self.db.update("flags", flag.model_dump(mode="json", exclude_unset=True), {"id": f"eq.{flag_id}"})
+        self.cache.invalidate()
+        updated = Flag(**data[0])
+        self.cache.set(f"id:{flag_id}", updated)
+        return updated
+
+    async def delete_flag(self, flag_id: UUID):
+        await self.db.delete("flags", {"id": f"eq.{flag_id}"})
+        self.cache.invalidate()
         return True
 
 flag_service = FlagService() 
\ No newline at end of file
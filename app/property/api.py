@@ -1,17 +1,34 @@
 import os
 import asyncio
-from fastapi import APIRouter, HTTPException, Query, Path
-from typing import List, Optional
+import logging
 import httpx
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from .models import Property
-from .clients import MLS_CONFIGURED
-from .services import transform_property
+from .models import Property, PropertyFacets
+from .clients import MLS_CONFIGURED, MLS_BASE_FILTERS
+from .services import transform_properties_json_parts, transform_property_detail
+from .replica import get_replica
+from .search_index import get_listing_index, SORT_OPTIONS
+from core.pagination import decode_cursor, encode_cursor, query_fingerprint
+from .geo import BBox, haversine_km, parse_bbox, radius_bbox
+from core.cache import TTLCache
+from core.serialization import RawJSONResponse, dumps, json_array
+from core.etag import cache_control, content_etag, http_date, make_etag, not_modified
+from core.governor import UpstreamUnavailable
+from core.metrics import metrics
 
 if MLS_CONFIGURED:
     from .clients import (
-        fetch_preferred_largest_media, 
+        fetch_media_batch,
+        fetch_properties_batch,
+        iter_media_batches,
+        select_preferred_largest,
+        select_largest,
         fetch_largest_media, 
+        fetch_mls_json,
         MLS_API_URL, 
         MLS_AUTH_TOKEN
     )
@@ -22,34 +39,88 @@ else:
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 # Configuration constants
 PROPERTY_TOP_LIMIT = int(os.getenv("PROPERTY_TOP_LIMIT", 24))
-REQUEST_TIMEOUT = 30.0
-CONCURRENCY_LIMIT = 4
+PROPERTY_STREAM_DEFAULT_LIMIT = int(os.getenv("PROPERTY_STREAM_DEFAULT_LIMIT", 100))
+PROPERTY_STREAM_MAX_LIMIT = int(os.getenv("PROPERTY_STREAM_MAX_LIMIT", 1000))
+PROPERTY_STREAM_PAGE_SIZE = int(os.getenv("PROPERTY_STREAM_PAGE_SIZE", 25))
+PROPERTY_GEO_MAX_LIMIT = int(os.getenv("PROPERTY_GEO_MAX_LIMIT", 500))
+
+# Facet configuration
+PROPERTY_FACET_PRICE_BINS = int(os.getenv("PROPERTY_FACET_PRICE_BINS", 20))
+PROPERTY_FACET_CACHE_TTL = float(os.getenv("PROPERTY_FACET_CACHE_TTL", 300))
+PROPERTY_FACET_CACHE_MAX_ENTRIES = int(os.getenv("PROPERTY_FACET_CACHE_MAX_ENTRIES", 512))
+
+# HTTP caching policy per route, in seconds
+PROPERTY_DETAIL_MAX_AGE = int(os.getenv("PROPERTY_DETAIL_MAX_AGE", 60))
+PROPERTY_DETAIL_STALE_WHILE_REVALIDATE = int(os.getenv("PROPERTY_DETAIL_STALE_WHILE_REVALIDATE", 300))
+PROPERTY_SEARCH_MAX_AGE = int(os.getenv("PROPERTY_SEARCH_MAX_AGE", 30))
+PROPERTY_SEARCH_STALE_WHILE_REVALIDATE = int(os.getenv("PROPERTY_SEARCH_STALE_WHILE_REVALIDATE", 120))
+PROPERTY_FACETS_MAX_AGE = int(os.getenv("PROPERTY_FACETS_MAX_AGE", 60))
+PROPERTY_FACETS_STALE_WHILE_REVALIDATE = int(os.getenv("PROPERTY_FACETS_STALE_WHILE_REVALIDATE", 300))
+# How long a served ETag is trusted to answer revalidations without asking MLS
+PROPERTY_VALIDATOR_TTL = float(os.getenv("PROPERTY_VALIDATOR_TTL", 60))
+PROPERTY_VALIDATOR_MAX_ENTRIES = int(os.getenv("PROPERTY_VALIDATOR_MAX_ENTRIES", 10000))
+
+DETAIL_CACHE_CONTROL = cache_control(PROPERTY_DETAIL_MAX_AGE, PROPERTY_DETAIL_STALE_WHILE_REVALIDATE)
+SEARCH_CACHE_CONTROL = cache_control(PROPERTY_SEARCH_MAX_AGE, PROPERTY_SEARCH_STALE_WHILE_REVALIDATE)
+FACETS_CACHE_CONTROL = cache_control(PROPERTY_FACETS_MAX_AGE, PROPERTY_FACETS_STALE_WHILE_REVALIDATE)
+
+# Validators (ETag, Last-Modified, ...) of recently served detail and search pages
+property_validators = TTLCache(
+    max_entries=PROPERTY_VALIDATOR_MAX_ENTRIES,
+    ttl=PROPERTY_VALIDATOR_TTL,
+    name="property_validators"
+)
+
+# Keyed by index generation, so a rebuilt index never serves old counts
+facet_cache = TTLCache(
+    max_entries=PROPERTY_FACET_CACHE_MAX_ENTRIES,
+    ttl=PROPERTY_FACET_CACHE_TTL,
+    name="facet_cache"
+)
 
-# Semaphore for controlling concurrent requests
-semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
+# OData $orderby equivalents of the index sort options
+MLS_ORDER_BY = {
+    "price": "ListPrice asc",
+    "-price": "ListPrice desc",
+    "beds": "BedroomsTotal asc",
+    "-beds": "BedroomsTotal desc",
+    "sqft": "LivingArea asc",
+    "-sqft": "LivingArea desc",
+    "newest": "ModificationTimestamp desc"
+}
 
 def build_filter_str(
     city: Optional[str] = None,
+    city_region: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     min_beds: Optional[int] = None,
     max_beds: Optional[int] = None,
     min_baths: Optional[int] = None,
     max_baths: Optional[int] = None,
-    property_type: Optional[str] = None
+    property_type: Optional[str] = None,
+    bbox: Optional[BBox] = None
 ) -> Optional[str]:
     """Build OData filter string for MLS API queries."""
-    filters = [
-        "PropertyType eq 'Residential Freehold'",
-        "RentalApplicationYN eq true",
-        "OriginatingSystemName eq 'Toronto Regional Real Estate Board'"
-    ]
+    filters = list(MLS_BASE_FILTERS)
     
     # Location filter
     if city:
         filters.append(f"contains(City, '{city}')")
+    if city_region:
+        filters.append(f"CityRegion eq '{city_region}'")
+    if bbox:
+        min_lat, min_lng, max_lat, max_lng = bbox
+        filters.append(f"Latitude ge {min_lat} and Latitude le {max_lat}")
+        filters.append(f"Longitude ge {min_lng} and Longitude le {max_lng}")
+    
+    # Property type filter
+    if property_type:
+        filters.append(f"PropertySubType eq '{property_type}'")
     
     # Price filters
     if min_price is not None:
@@ -71,134 +142,483 @@ def build_filter_str(
     
     return ' and '.join(filters)
 
-async def get_transformed_property(mls_property: dict) -> Optional[Property]:
-    """Transform MLS property data with media URLs."""
-    listing_key = mls_property.get("ListingKey")
-    if not listing_key:
-        return None
-    
-    async with semaphore:
-        media_urls = await fetch_preferred_largest_media(listing_key)
-    
-    return transform_property(mls_property, media_urls)
+async def get_transformed_properties(mls_properties: List[dict]) -> List[bytes]:
+    """Serialized Property JSON for a page of MLS properties, fetching their media in one batch."""
+    listed = [prop for prop in mls_properties if prop.get("ListingKey")]
+    try:
+        media_by_key = await fetch_media_batch(prop["ListingKey"] for prop in listed)
+    except (UpstreamUnavailable, httpx.HTTPError) as e:
+        raise mls_error(e)
+    return transform_properties_json_parts(
+        listed,
+        [select_preferred_largest(media_by_key.get(prop["ListingKey"], [])) for prop in listed]
+    )
 
 
-async def fetch_mls_data(url: str) -> List[dict]:
-    """Fetch data from MLS API with proper error handling."""
+def mls_error(e: Exception) -> HTTPException:
+    """HTTP error for a failed MLS call: 503 with Retry-After while the circuit is open, else 502."""
+    if isinstance(e, UpstreamUnavailable):
+        return HTTPException(
+            status_code=503,
+            detail="MLS API temporarily unavailable.",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    return HTTPException(status_code=502, detail=f"MLS API error: {e}")
+
+async def fetch_mls_page(url: str, call_type: Optional[str] = None) -> dict:
+    """Fetch one OData page (value plus @odata.nextLink) from the MLS API."""
     if not MLS_CONFIGURED:
         raise HTTPException(
             status_code=503,
             detail="MLS API not configured."
         )
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url,
-            headers={
-                "Authorization": f"Bearer {MLS_AUTH_TOKEN}",
-                "Accept": "application/json"
-            },
-            timeout=REQUEST_TIMEOUT
-        )
-        response.raise_for_status()
-        return response.json().get("value", [])
+    try:
+        return await fetch_mls_json(url, call_type=call_type)
+    except UpstreamUnavailable as e:
+        raise mls_error(e)
+
+async def fetch_mls_data(url: str, call_type: Optional[str] = None) -> List[dict]:
+    """Fetch data from MLS API with proper error handling."""
+    data = await fetch_mls_page(url, call_type)
+    return data.get("value", [])
+
+def property_search_params(
+    city: Optional[str] = Query(None, description="Filter by city"),
+    city_region: Optional[str] = Query(None, description="Filter by city region"),
+    min_price: Optional[float] = Query(None, description="Minimum price"),
+    max_price: Optional[float] = Query(None, description="Maximum price"),
+    min_beds: Optional[int] = Query(None, description="Minimum bedrooms"),
+    max_beds: Optional[int] = Query(None, description="Maximum bedrooms"),
+    min_baths: Optional[int] = Query(None, description="Minimum bathrooms"),
+    max_baths: Optional[int] = Query(None, description="Maximum bathrooms"),
+    property_type: Optional[str] = Query(None, description="Property sub-type, e.g. Detached"),
+    sort_by: Optional[str] = Query(
+        None,
+        description=f"Sort order, one of: {', '.join(SORT_OPTIONS)}"
+    )
+) -> dict:
+    """Search filters shared by the list and stream endpoints."""
+    if sort_by is not None and sort_by not in SORT_OPTIONS:
+        raise HTTPException(status_code=422, detail=f"Unsupported sort_by: {sort_by}")
+    return {
+        "city": city,
+        "city_region": city_region,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_beds": min_beds,
+        "max_beds": max_beds,
+        "min_baths": min_baths,
+        "max_baths": max_baths,
+        "property_type": property_type,
+        "sort_by": sort_by
+    }
+
+def build_search_url(params: dict, limit: int, skip: int = 0, bbox: Optional[BBox] = None) -> str:
+    """Build the MLS Property query URL for a search page."""
+    filters = {name: value for name, value in params.items() if name != "sort_by"}
+    url = f"{MLS_API_URL}/Property?$top={limit}&$filter={build_filter_str(**filters, bbox=bbox)}"
+    if params.get("sort_by"):
+        url += f"&$orderby={MLS_ORDER_BY[params['sort_by']]}"
+    if skip:
+        url += f"&$skip={skip}"
+    return url
+
+def next_mls_skip(data: dict, skip: int, count: int, limit: int) -> Optional[int]:
+    """Offset of the next MLS page, preferring the server's @odata.nextLink."""
+    next_link = data.get("@odata.nextLink")
+    if next_link:
+        try:
+            return int(httpx.URL(next_link).params.get("$skip"))
+        except (TypeError, ValueError):
+            pass
+    return skip + count if count == limit else None
+
+def read_cursor(cursor: Optional[str], params: dict) -> Tuple[str, Optional[dict]]:
+    """Return the query fingerprint and the decoded cursor position, if any."""
+    fingerprint = query_fingerprint(**params)
+    position = decode_cursor(cursor, fingerprint) if cursor else None
+    if position is not None and position.get("m") == "index" and get_listing_index() is None:
+        raise HTTPException(status_code=400, detail="Cursor has expired, restart from the first page")
+    return fingerprint, position
+
+async def search_properties_page(params: dict, limit: int, cursor: Optional[str] = None) -> Tuple[List[bytes], Optional[str]]:
+    """Return one page of serialized search results and the cursor for the next page."""
+    fingerprint, position = read_cursor(cursor, params)
+    predicates = {name: value for name, value in params.items() if name != "sort_by"}
+    
+    # Index cursors are keyset positions; MLS cursors are OData offsets
+    index = get_listing_index()
+    if index is not None and (position is None or position.get("m") == "index"):
+        after = (position["v"], position["k"]) if position else None
+        rows = index.search_rows(limit, params["sort_by"], after, **predicates)
+        properties = transform_properties_json_parts([index.records[i] for i in rows], [index.images[i] for i in rows])
+        next_cursor = None
+        if len(rows) == limit:
+            value, key = index.cursor_for(rows[-1], params["sort_by"])
+            next_cursor = encode_cursor({"q": fingerprint, "m": "index", "v": value, "k": key})
+        return properties, next_cursor
+    
+    skip = position["s"] if position else 0
+    data = await fetch_mls_page(build_search_url(params, limit, skip))
+    mls_properties = data.get("value", [])
+    next_skip = next_mls_skip(data, skip, len(mls_properties), limit)
+    next_cursor = encode_cursor({"q": fingerprint, "m": "mls", "s": next_skip}) if next_skip else None
+    if not mls_properties:
+        return [], None
+    
+    # Media for the whole page comes from a few batched queries
+    return await get_transformed_properties(mls_properties), next_cursor
+
+def search_validator_key(params: dict, limit: int, cursor: Optional[str]) -> str:
+    """Validator cache key for a search page; includes the index generation so a rebuild invalidates it."""
+    index = get_listing_index()
+    generation = index.generation if index is not None else 0
+    return f"search:{generation}:{limit}:{query_fingerprint(**params)}:{cursor or ''}"
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
 
 @router.get("/properties", response_model=List[Property])
 async def get_properties(
+    request: Request,
     limit: int = Query(
         default=PROPERTY_TOP_LIMIT, 
         ge=1, 
         le=50, 
         description="Number of properties to return"
     ),
-    city: Optional[str] = Query(None, description="Filter by city"),
-    min_price: Optional[float] = Query(None, description="Minimum price"),
-    max_price: Optional[float] = Query(None, description="Maximum price"),
-    min_beds: Optional[int] = Query(None, description="Minimum bedrooms"),
-    max_beds: Optional[int] = Query(None, description="Maximum bedrooms"),
-    min_baths: Optional[int] = Query(None, description="Minimum bathrooms"),
-    max_baths: Optional[int] = Query(None, description="Maximum bathrooms"),
-    property_type: Optional[str] = Query(None, description="Property type (ignored)")
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    params: dict = Depends(property_search_params)
 ):
-    """Get list of properties with optional filtering."""
+    """Get list of properties with optional filtering.
+    
+    When more results exist, the X-Next-Cursor response header carries the
+    cursor for the next page. Pages carry an ETag; a revalidation of a page
+    served recently is answered with 304 before MLS is queried.
+    """
+    validator_key = search_validator_key(params, limit, cursor)
+    validator = property_validators.get(validator_key)
+    if validator is not None and not_modified(request, validator["headers"]["ETag"]):
+        return not_modified_response(validator["headers"])
+    
     try:
-        filter_str = build_filter_str(
-            city=city,
-            min_price=min_price,
-            max_price=max_price,
-            min_beds=min_beds,
-            max_beds=max_beds,
-            min_baths=min_baths,
-            max_baths=max_baths,
-            property_type=property_type
+        properties, next_cursor = await search_properties_page(params, limit, cursor)
+    except HTTPException:
+        # Re-raise HTTP exceptions as-is
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Error fetching properties: {str(e)}"
         )
+    
+    body = json_array(properties)
+    headers = {"ETag": content_etag(body), "Cache-Control": SEARCH_CACHE_CONTROL}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    property_validators.set(validator_key, {"headers": headers})
+    if not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    # Already validated and serialized; skip response_model re-validation
+    return RawJSONResponse(body, headers=headers)
+
+async def stream_index_results(params: dict, limit: int, position: Optional[dict]) -> AsyncIterator[bytes]:
+    """Yield search results from the local listing index as NDJSON lines."""
+    predicates = {name: value for name, value in params.items() if name != "sort_by"}
+    index = get_listing_index()
+    after = (position["v"], position["k"]) if position else None
+    rows = index.search_rows(limit, params["sort_by"], after, **predicates)
+    for part in transform_properties_json_parts([index.records[i] for i in rows], [index.images[i] for i in rows]):
+        yield part + b"\n"
+
+async def stream_mls_results(params: dict, limit: int, skip: int, first_page: dict) -> AsyncIterator[bytes]:
+    """Yield MLS search results as NDJSON lines as soon as each one is ready.
+    
+    Pages are small, with the next page prefetched while media for the
+    current one streams out. The first page is fetched by the caller, so
+    its errors become a proper status. A later failure is logged and
+    aborts the response, so clients see a truncated stream rather than a
+    clean end.
+    """
+    remaining = limit
+    page_size = min(PROPERTY_STREAM_PAGE_SIZE, remaining)
+    next_page: Optional[asyncio.Future] = None
+    data: Optional[dict] = first_page
+    try:
+        while data is not None:
+            mls_properties = [prop for prop in data.get("value", []) if prop.get("ListingKey")][:remaining]
+            remaining -= len(mls_properties)
+            next_skip = next_mls_skip(data, skip, len(data.get("value", [])), page_size)
+            if remaining > 0 and next_skip:
+                skip = next_skip
+                page_size = min(PROPERTY_STREAM_PAGE_SIZE, remaining)
+                next_page = asyncio.ensure_future(fetch_mls_page(build_search_url(params, page_size, skip)))
+            
+            # Media chunks complete in any order; rows go out in page order,
+            # each as soon as it and every row before it have their media
+            media_by_key: Dict[str, List[dict]] = {}
+            emitted = 0
+            async for batch in iter_media_batches(prop["ListingKey"] for prop in mls_properties):
+                media_by_key.update(batch)
+                ready = []
+                while emitted < len(mls_properties) and mls_properties[emitted]["ListingKey"] in media_by_key:
+                    ready.append(mls_properties[emitted])
+                    emitted += 1
+                parts = transform_properties_json_parts(
+                    ready,
+                    [select_preferred_largest(media_by_key[prop["ListingKey"]]) for prop in ready]
+                )
+                for part in parts:
+                    yield part + b"\n"
+            
+            data = None
+            if next_page is not None:
+                data = await next_page
+                next_page = None
+    except Exception:
+        metrics.incr("properties.stream_errors")
+        logger.exception("MLS property stream failed after the response started")
+        raise
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+
+@router.get("/properties/stream")
+async def stream_properties(
+    limit: int = Query(
+        default=PROPERTY_STREAM_DEFAULT_LIMIT,
+        ge=1,
+        le=PROPERTY_STREAM_MAX_LIMIT,
+        description="Number of properties to stream"
+    ),
+    cursor: Optional[str] = Query(None, description="Cursor to start streaming from"),
+    params: dict = Depends(property_search_params)
+):
+    """Stream properties as NDJSON (one Property per line) as they become ready.
+    
+    The first MLS page is fetched before the response starts, so an MLS
+    failure answers 502 or 503 instead of an empty 200 stream.
+    """
+    if not MLS_CONFIGURED and get_listing_index() is None:
+        raise HTTPException(status_code=503, detail="MLS API not configured.")
+    _, position = read_cursor(cursor, params)
+    if get_listing_index() is not None and (position is None or position.get("m") == "index"):
+        body = stream_index_results(params, limit, position)
+    else:
+        skip = position["s"] if position else 0
+        url = build_search_url(params, min(PROPERTY_STREAM_PAGE_SIZE, limit), skip)
+        try:
+            first_page = await fetch_mls_page(url)
+        except httpx.HTTPError as e:
+            raise mls_error(e)
+        body = stream_mls_results(params, limit, skip, first_page)
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
+def conditional_json(request: Request, body: bytes, cache_policy: str) -> Response:
+    """Serialized JSON with a content ETag, or 304 if the client already has it."""
+    headers = {"ETag": content_etag(body), "Cache-Control": cache_policy}
+    if not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    return RawJSONResponse(body, headers=headers)
+
+@router.get("/properties/geo", response_model=List[Property])
+async def get_properties_geo(
+    request: Request,
+    bbox: Optional[str] = Query(None, description="Bounding box as min_lng,min_lat,max_lng,max_lat"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude for radius or nearest search"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude for radius or nearest search"),
+    radius_km: Optional[float] = Query(None, gt=0, le=100, description="Search radius in km around lat/lng"),
+    nearest: Optional[int] = Query(None, ge=1, le=50, description="Return the N listings nearest to lat/lng"),
+    limit: int = Query(
+        default=100,
+        ge=1,
+        le=PROPERTY_GEO_MAX_LIMIT,
+        description="Number of properties to return for bbox and radius searches"
+    ),
+    params: dict = Depends(property_search_params)
+):
+    """Map search: listings in a bounding box, within a radius, or nearest to a point.
+    
+    Radius and nearest results are ordered by distance; bbox results by ListingKey.
+    """
+    modes = [bbox is not None, radius_km is not None, nearest is not None]
+    if sum(modes) != 1:
+        raise HTTPException(status_code=422, detail="Use exactly one of bbox, radius_km or nearest")
+    if (radius_km is not None or nearest is not None) and (lat is None or lng is None):
+        raise HTTPException(status_code=422, detail="lat and lng are required for radius and nearest searches")
+    try:
+        box = parse_bbox(bbox) if bbox is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    predicates = {name: value for name, value in params.items() if name != "sort_by"}
+    
+    try:
+        index = get_listing_index()
+        if index is not None:
+            if box is not None:
+                rows = index.search_bbox(box, limit, **predicates)
+            elif radius_km is not None:
+                rows, _ = index.search_radius(lat, lng, radius_km, limit, **predicates)
+            else:
+                rows, _ = index.search_nearest(lat, lng, nearest, **predicates)
+            return conditional_json(request, json_array(
+                transform_properties_json_parts([index.records[i] for i in rows], [index.images[i] for i in rows])
+            ), SEARCH_CACHE_CONTROL)
         
-        url = f"{MLS_API_URL}/Property?$top={limit}"
-        if filter_str:
-            url += f"&$filter={filter_str}"
-        
-        mls_properties = await fetch_mls_data(url)
+        # Upstream can only narrow by a lat/lng box; distances are applied here
+        if nearest is not None:
+            raise HTTPException(status_code=503, detail="Nearest search needs the local listing index")
+        if radius_km is not None:
+            box = radius_bbox(lat, lng, radius_km)
+        mls_properties = await fetch_mls_data(build_search_url(params, limit, bbox=box))
+        if radius_km is not None:
+            located = [
+                prop for prop in mls_properties
+                if prop.get("Latitude") is not None and prop.get("Longitude") is not None
+            ]
+            distances = haversine_km(
+                lat, lng,
+                np.array([float(prop["Latitude"]) for prop in located]),
+                np.array([float(prop["Longitude"]) for prop in located])
+            )
+            mls_properties = [
+                prop for distance, prop in sorted(zip(distances, located), key=lambda pair: pair[0])
+                if distance <= radius_km
+            ]
         if not mls_properties:
-            return []
-        
-        # Transform properties concurrently
-        tasks = [get_transformed_property(prop) for prop in mls_properties]
-        results = await asyncio.gather(*tasks)
-        
-        # Filter out None results
-        return [result for result in results if result is not None]
+            return conditional_json(request, b"[]", SEARCH_CACHE_CONTROL)
+        return conditional_json(request, json_array(await get_transformed_properties(mls_properties)), SEARCH_CACHE_CONTROL)
         
     except HTTPException:
-        # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
         raise HTTPException(
-            status_code=500, 
+            status_code=500,
             detail=f"Error fetching properties: {str(e)}"
         )
 
+def facet_cache_key(generation: int, params: dict, price_bins: int) -> str:
+    """Cache key for a facet query; text filters are case-insensitive so they are lowercased."""
+    normalized = {
+        name: value.strip().lower() if isinstance(value, str) else value
+        for name, value in params.items()
+        if name != "sort_by"
+    }
+    return f"facets:{generation}:{price_bins}:{query_fingerprint(**normalized)}"
+
+@router.get("/properties/facets", response_model=PropertyFacets)
+async def get_property_facets(
+    request: Request,
+    price_bins: int = Query(
+        default=PROPERTY_FACET_PRICE_BINS,
+        ge=1,
+        le=100,
+        description="Number of price histogram buckets"
+    ),
+    params: dict = Depends(property_search_params)
+):
+    """Facet counts for the filter sidebar: cities, property types, bedrooms,
+    bathrooms and a price histogram for the current filters.
+    """
+    index = get_listing_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Facets need the local listing index")
+    
+    key = facet_cache_key(index.generation, params, price_bins)
+    # Counts only change when the index is rebuilt, so the key is the validator
+    headers = {"ETag": make_etag(key), "Cache-Control": FACETS_CACHE_CONTROL}
+    if not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    facets = facet_cache.get(key)
+    if facets is None:
+        predicates = {name: value for name, value in params.items() if name != "sort_by"}
+        facets = index.facets(price_bins, **predicates)
+        facet_cache.set(key, facets)
+    return RawJSONResponse(dumps(facets), headers=headers)
+
+async def hydrate_properties(property_ids: List[str]) -> Dict[str, dict]:
+    """Property detail payloads for many ListingKeys, keyed by ListingKey.
+    
+    Listings come from the replica where possible; the rest cost one batched
+    Property query and one batched Media query per URL-sized chunk, with
+    cached records reused. Listings that cannot be found are left out; an
+    MLS failure raises 502 or 503 rather than dropping listings.
+    """
+    keys = list(dict.fromkeys(key for key in property_ids if key))
+    records: Dict[str, dict] = {}
+    media: Dict[str, List[dict]] = {}
+    
+    replica = get_replica()
+    if replica is not None and keys:
+        records.update(await asyncio.to_thread(replica.get_properties, keys))
+        media.update(await asyncio.to_thread(replica.media_for, list(records)))
+    
+    missing = [key for key in keys if key not in records]
+    if missing and MLS_CONFIGURED:
+        try:
+            fetched = await fetch_properties_batch(missing)
+            media.update(await fetch_media_batch(fetched))
+        except (UpstreamUnavailable, httpx.HTTPError) as e:
+            raise mls_error(e)
+        records.update(fetched)
+    
+    return {
+        key: transform_property_detail(records[key], select_largest(media.get(key, [])), key)
+        for key in keys
+        if key in records
+    }
+
+def detail_response(request: Request, property_id: str, mls_property: dict, images: List[str]) -> Response:
+    """Detail payload with validators from the listing's ModificationTimestamp, or 304."""
+    modified = mls_property.get("ModificationTimestamp")
+    headers = {"ETag": make_etag("property", property_id, modified, images), "Cache-Control": DETAIL_CACHE_CONTROL}
+    last_modified = http_date(modified)
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    property_validators.set(f"property:{property_id}", {"headers": headers})
+    if not_modified(request, headers["ETag"], last_modified):
+        return not_modified_response(headers)
+    return RawJSONResponse(dumps(transform_property_detail(mls_property, images, property_id)), headers=headers)
+
 @router.get("/properties/{property_id}")
 async def get_property_by_id(
+    request: Request,
     property_id: str = Path(..., description="MLS ListingKey")
 ):
-    """Get detailed information for a specific property."""
+    """Get detailed information for a specific property.
+    
+    Responses carry an ETag and Last-Modified from the listing's
+    ModificationTimestamp. Revalidations of a listing served recently are
+    answered with 304 before MLS is queried.
+    """
     try:
+        # Listings outside the replicated search filter still come from MLS
+        replica = get_replica()
+        mls_property = await asyncio.to_thread(replica.get_property, property_id) if replica is not None else None
+        if mls_property is not None:
+            media = (await asyncio.to_thread(replica.media_for, [property_id]))[property_id]
+            return detail_response(request, property_id, mls_property, select_largest(media))
+        
+        validator = property_validators.get(f"property:{property_id}")
+        if validator is not None:
+            headers = validator["headers"]
+            if not_modified(request, headers["ETag"], headers.get("Last-Modified")):
+                return not_modified_response(headers)
+        
         url = f"{MLS_API_URL}/Property?$filter=ListingKey eq '{property_id}'"
-        mls_properties = await fetch_mls_data(url)
+        mls_properties = await fetch_mls_data(url, call_type="property")
         
         if not mls_properties:
             return {"error": "Property not found"}
         
         mls_property = mls_properties[0]
-        images = await fetch_largest_media(property_id)
-        
-        # Build formatted address
-        address_parts = [
-            mls_property.get("PropertyAddress", ""),
-            mls_property.get("City", ""),
-            mls_property.get("StateOrProvince", ""),
-            mls_property.get("PostalCode", ""),
-            mls_property.get("Country", "") or "CA"
-        ]
-        address_str = ", ".join(filter(None, address_parts))
-        
-        return {
-            "id": mls_property.get("ListingKey", property_id),
-            "images": images,
-            "price": mls_property.get("ListPrice", ""),
-            "address": address_str,
-            "added": mls_property.get("ListingContractDate", ""),
-            "beds": int(mls_property.get("BedroomsTotal", 0) or 0),
-            "baths": int(mls_property.get("BathroomsTotalInteger", 0) or 0),
-            "parking": int(mls_property.get("ParkingTotal", 0) or 0),
-            "sqft": mls_property.get("LivingArea", ""),
-            "location": mls_property.get("City", ""),
-            "areaCode": mls_property.get("Area", ""),
-            "propertyType": mls_property.get("PropertyType", ""),
-            "availableDate": mls_property.get("AvailableDate", ""),
-            "leaseTerms": mls_property.get("LeaseTerm", ""),
-            "description": mls_property.get("PublicRemarks", "") or mls_property.get("PrivateRemarks", "") or ""
-        }
+        try:
+            images = await fetch_largest_media(property_id)
+        except (UpstreamUnavailable, httpx.HTTPError) as e:
+            # No images is not a version of the listing to cache or validate against
+            raise mls_error(e)
+        return detail_response(request, property_id, mls_property, images)
         
     except HTTPException:
         # Re-raise HTTP exceptions as-is
@@ -1,95 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from app.auth.deps import get_current_user
-import httpx
-import os
-import asyncio
-from app.property.api import get_property_by_id
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from app.auth.deps import get_current_user_supabase
+from app.property.models import PropertyIds
+from app.property.saved import (
+    CART_TABLE,
+    WISHLIST_TABLE,
+    add_saved,
+    bulk_add,
+    bulk_move,
+    bulk_remove,
+    clear_saved,
+    remove_saved,
+    saved_cards,
+    saved_etag,
+    saved_rows
+)
+from core.database import SupabaseError
+from core.etag import etag_matches
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
+router = APIRouter(prefix="/cart", tags=["cart"])
 
-if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    raise RuntimeError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables or .env file.")
+# Add several properties to cart in one request
+@router.post("/bulk", status_code=200)
+async def bulk_add_to_cart(body: PropertyIds, user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    return await bulk_add(CART_TABLE, user["sub"], body.property_ids, auth=auth_header)
 
-router = APIRouter(prefix="/cart", tags=["cart"])
+# Remove several properties from cart in one request
+@router.post("/bulk/remove", status_code=200)
+async def bulk_remove_from_cart(body: PropertyIds, user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    return await bulk_remove(CART_TABLE, user["sub"], body.property_ids, auth=auth_header)
 
-# Helper to get Supabase REST endpoint
-CART_ENDPOINT = f"{SUPABASE_URL}/rest/v1/cart"
+# Move properties from cart to wishlist
+@router.post("/move-to-wishlist", status_code=200)
+async def move_to_wishlist(body: PropertyIds, user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    return await bulk_move(CART_TABLE, WISHLIST_TABLE, user["sub"], body.property_ids, auth=auth_header)
 
 # Add property to cart
 @router.post("/{property_id}", status_code=201)
-async def add_to_cart(property_id: str, user=Depends(get_current_user), request: Request = None):
+async def add_to_cart(property_id: str, user=Depends(get_current_user_supabase), request: Request = None):
     user_id = user["sub"]
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Prefer": "return=representation"
-    }
-    if SUPABASE_ANON_KEY:
-        headers["apikey"] = SUPABASE_ANON_KEY
+    # Run as the caller so row-level security applies
     auth_header = request.headers.get("Authorization") if request else None
-    if auth_header:
-        headers["Authorization"] = auth_header
-    payload = {"user_id": user_id, "property_id": property_id}
-    
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(CART_ENDPOINT, headers=headers, json=payload)
-        if resp.status_code in (201, 200):
-            return resp.json()
-        # Gracefully handle unique constraint violation
-        if resp.status_code == 409 or ("duplicate key" in resp.text or "already exists" in resp.text or "unique constraint" in resp.text):
-            return {"ok": True, "message": "Already in cart"}
-        raise HTTPException(status_code=resp.status_code, detail=resp.text)
+    try:
+        # Duplicates are skipped by the upsert, so an empty result means already saved
+        added = await add_saved(CART_TABLE, user_id, [property_id], auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return added or {"ok": True, "message": "Already in cart"}
 
 # Remove property from cart
 @router.delete("/{property_id}", status_code=204)
-async def remove_from_cart(property_id: str, user=Depends(get_current_user), request: Request = None):
+async def remove_from_cart(property_id: str, user=Depends(get_current_user_supabase), request: Request = None):
     user_id = user["sub"]
-    headers = {}
-    if SUPABASE_ANON_KEY:
-        headers["apikey"] = SUPABASE_ANON_KEY
     auth_header = request.headers.get("Authorization") if request else None
-    if auth_header:
-        headers["Authorization"] = auth_header
-    # Use query params to delete
-    url = f"{CART_ENDPOINT}?user_id=eq.{user_id}&property_id=eq.{property_id}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.delete(url, headers=headers)
-        if resp.status_code not in (204, 200):
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return {"ok": True}
+    try:
+        await remove_saved(CART_TABLE, user_id, [property_id], auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return {"ok": True}
+
+# Remove every property from cart
+@router.delete("/", status_code=204)
+async def clear_cart(user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    try:
+        await clear_saved(CART_TABLE, user["sub"], auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return Response(status_code=204)
 
 # List all cart properties for user
 @router.get("/", status_code=200)
-async def list_cart(user=Depends(get_current_user), request: Request = None):
+async def list_cart(response: Response, user=Depends(get_current_user_supabase), request: Request = None):
     user_id = user["sub"]
-    
-    headers = {}
-    if SUPABASE_ANON_KEY:
-        headers["apikey"] = SUPABASE_ANON_KEY
     auth_header = request.headers.get("Authorization") if request else None
-    if auth_header:
-        headers["Authorization"] = auth_header
-    url = f"{CART_ENDPOINT}?user_id=eq.{user_id}"
-    
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, headers=headers)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        cart_rows = resp.json()
+    try:
+        cart_rows = await saved_rows(CART_TABLE, user_id, auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
 
     # Validate that all returned entries belong to the current user
     for entry in cart_rows:
         if entry.get("user_id") != user_id:
             raise HTTPException(status_code=500, detail="Data integrity error: cart contains items from other users")
 
-    # Fetch all property objects in parallel
+    # Cached cards, with the rest resolved by a few batched lookups
     property_ids = [entry["property_id"] for entry in cart_rows]
+    cards = await saved_cards(property_ids)
+    etag = saved_etag(CART_TABLE, user_id, cart_rows, cards)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    # Only include listings that still exist
+    cart = [cards[pid][0] for pid in property_ids if pid in cards]
     
-    async def fetch_property(property_id):
-        return await get_property_by_id(property_id)
-    property_objs = await asyncio.gather(*[fetch_property(pid) for pid in property_ids])
-    # Only include non-null properties
-    cart = [prop for prop in property_objs if prop]
-    
-    return {"cart": cart, "user_id": user_id, "debug_info": {"raw_entries": len(cart_rows), "valid_properties": len(cart)}} 
\ No newline at end of file
+    return {"cart": cart, "user_id": user_id, "debug_info": {"raw_entries": len(cart_rows), "valid_properties": len(cart)}}
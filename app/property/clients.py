@@ -1,13 +1,94 @@
 import os
+import asyncio
 import httpx
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
-from fastapi import HTTPException
+from core.cache import DiskCacheTier, TTLCache
+from core.governor import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    HedgePolicy,
+    RetryBudget,
+    UpstreamGovernor,
+    UpstreamUnavailable
+)
+from core.http import http2_available
+from core.metrics import metrics
+from core.singleflight import SingleFlight
 
 load_dotenv()
 
 MLS_API_URL = os.getenv("MLS_URL")
 MLS_AUTH_TOKEN = os.getenv("MLS_AUTHTOKEN")
 MLS_TOP_LIMIT = os.getenv("MLS_TOP_LIMIT", "12")
+MLS_PROPERTY_IMAGE_FILTER_FIELDS = os.getenv("MLS_PROPERTY_IMAGE_FILTER_FIELDS", "")
+
+# Filters every property query starts from
+MLS_BASE_FILTERS = [
+    "PropertyType eq 'Residential Freehold'",
+    "RentalApplicationYN eq true",
+    "OriginatingSystemName eq 'Toronto Regional Real Estate Board'"
+]
+
+# Connection pool configuration for the shared MLS client
+MLS_HTTP2 = os.getenv("MLS_HTTP2", "true").lower() == "true"
+MLS_MAX_CONNECTIONS = int(os.getenv("MLS_MAX_CONNECTIONS", 20))
+MLS_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MLS_MAX_KEEPALIVE_CONNECTIONS", 10))
+MLS_KEEPALIVE_EXPIRY = float(os.getenv("MLS_KEEPALIVE_EXPIRY", 30.0))
+MLS_CONNECT_TIMEOUT = float(os.getenv("MLS_CONNECT_TIMEOUT", 5.0))
+MLS_READ_TIMEOUT = float(os.getenv("MLS_READ_TIMEOUT", 30.0))
+MLS_POOL_TIMEOUT = float(os.getenv("MLS_POOL_TIMEOUT", 10.0))
+
+# Batched property and media lookups
+MLS_MAX_URL_LENGTH = int(os.getenv("MLS_MAX_URL_LENGTH", 2000))
+MLS_MEDIA_PAGE_SIZE = int(os.getenv("MLS_MEDIA_PAGE_SIZE", 500))
+MLS_MEDIA_BATCH_CONCURRENCY = int(os.getenv("MLS_MEDIA_BATCH_CONCURRENCY", 4))
+MLS_PROPERTY_BATCH_CONCURRENCY = int(os.getenv("MLS_PROPERTY_BATCH_CONCURRENCY", 4))
+MLS_ODATA_IN_OPERATOR = os.getenv("MLS_ODATA_IN_OPERATOR", "true").lower() == "true"
+
+# Response caching
+MLS_CACHE_ENABLED = os.getenv("MLS_CACHE_ENABLED", "true").lower() == "true"
+MLS_CACHE_TTL = float(os.getenv("MLS_CACHE_TTL", 60))
+MLS_MEDIA_CACHE_TTL = float(os.getenv("MLS_MEDIA_CACHE_TTL", 300))
+MLS_CACHE_STALE_TTL = float(os.getenv("MLS_CACHE_STALE_TTL", 120))
+MLS_CACHE_MAX_ENTRIES = int(os.getenv("MLS_CACHE_MAX_ENTRIES", 2048))
+MLS_CACHE_SHARED_PATH = os.getenv("MLS_CACHE_SHARED_PATH", "")
+# Last good responses, served when MLS is failing or the circuit is open
+MLS_STALE_IF_ERROR_TTL = float(os.getenv("MLS_STALE_IF_ERROR_TTL", 3600))
+
+# Adaptive concurrency (AIMD) for all MLS traffic
+MLS_CONCURRENCY_INITIAL = int(os.getenv("MLS_CONCURRENCY_INITIAL", 8))
+MLS_CONCURRENCY_MIN = int(os.getenv("MLS_CONCURRENCY_MIN", 1))
+MLS_CONCURRENCY_MAX = int(os.getenv("MLS_CONCURRENCY_MAX", MLS_MAX_CONNECTIONS))
+# Responses slower than this shrink the limit like an error, only more gently
+MLS_LATENCY_TARGET = float(os.getenv("MLS_LATENCY_TARGET", 2.0))
+
+# Retries with jittered exponential backoff
+MLS_RETRY_MAX_ATTEMPTS = int(os.getenv("MLS_RETRY_MAX_ATTEMPTS", 3))
+MLS_RETRY_BASE_DELAY = float(os.getenv("MLS_RETRY_BASE_DELAY", 0.2))
+MLS_RETRY_MAX_DELAY = float(os.getenv("MLS_RETRY_MAX_DELAY", 5.0))
+# Retries allowed per request on top of a small per-second floor
+MLS_RETRY_BUDGET_RATIO = float(os.getenv("MLS_RETRY_BUDGET_RATIO", 0.2))
+MLS_RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("MLS_RETRY_BUDGET_MIN_PER_SECOND", 1.0))
+# Longest Retry-After we wait out; longer ones fail fast
+MLS_RETRY_AFTER_MAX = float(os.getenv("MLS_RETRY_AFTER_MAX", 30.0))
+
+# Circuit breaker
+MLS_BREAKER_FAILURE_RATIO = float(os.getenv("MLS_BREAKER_FAILURE_RATIO", 0.5))
+MLS_BREAKER_MIN_CALLS = int(os.getenv("MLS_BREAKER_MIN_CALLS", 10))
+MLS_BREAKER_WINDOW = float(os.getenv("MLS_BREAKER_WINDOW", 30.0))
+MLS_BREAKER_OPEN_SECONDS = float(os.getenv("MLS_BREAKER_OPEN_SECONDS", 30.0))
+
+# Hedged requests: call types to hedge and the latency percentile that triggers the backup,
+# e.g. "property:0.95,media:0.95"; empty disables hedging
+MLS_HEDGE_CALL_TYPES = os.getenv("MLS_HEDGE_CALL_TYPES", "property:0.95,media:0.95")
+# Hedges allowed per hedgeable call
+MLS_HEDGE_BUDGET_RATIO = float(os.getenv("MLS_HEDGE_BUDGET_RATIO", 0.05))
+MLS_HEDGE_MIN_DELAY = float(os.getenv("MLS_HEDGE_MIN_DELAY", 0.05))
+MLS_HEDGE_MAX_DELAY = float(os.getenv("MLS_HEDGE_MAX_DELAY", 5.0))
+# Recent latencies kept per call type, and how many before hedging starts
+MLS_HEDGE_WINDOW = int(os.getenv("MLS_HEDGE_WINDOW", 500))
+MLS_HEDGE_MIN_SAMPLES = int(os.getenv("MLS_HEDGE_MIN_SAMPLES", 20))
 
 # Validate required environment variables
 def is_placeholder_value(value):
@@ -36,70 +117,357 @@ if MLS_API_URL and MLS_AUTH_TOKEN:
 else:
     print("Warning: MLS_API_URL and/or MLS_AUTH_TOKEN not set")
 
-async def fetch_mls_properties(limit: int = 12):
-    """Fetch properties from MLS API with custom filter"""
-    filter_str = (
-        "PropertyType eq 'Residential Freehold' and "
-        "RentalApplicationYN eq true and "
-        "OriginatingSystemName eq 'Toronto Regional Real Estate Board'"
-    )
-    url = f"{MLS_API_URL}/Property?$top={limit}&$filter={filter_str}"
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                url,
-                headers={
-                    "Authorization": f"Bearer {MLS_AUTH_TOKEN}",
-                    "Accept": "application/json"
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json().get("value", [])
-        except Exception as e:
-            print(f"Error fetching MLS properties: {e}")
-            return []
-
-async def fetch_preferred_largest_media(listing_key: str):
-    """Fetch preferred largest images for a specific property. If none, fallback to all largest."""
-    async with httpx.AsyncClient() as client:
+_mls_client: Optional[httpx.AsyncClient] = None
+
+mls_cache = TTLCache(
+    max_entries=MLS_CACHE_MAX_ENTRIES,
+    ttl=MLS_CACHE_TTL,
+    stale_ttl=MLS_CACHE_STALE_TTL,
+    shared=DiskCacheTier(MLS_CACHE_SHARED_PATH) if MLS_CACHE_SHARED_PATH else None,
+    name="mls_cache"
+)
+
+# Kept well past the freshness TTL; only read when a live request fails
+mls_stale_cache = TTLCache(
+    max_entries=MLS_CACHE_MAX_ENTRIES,
+    ttl=MLS_STALE_IF_ERROR_TTL,
+    name="mls_stale_cache"
+)
+
+# Identical concurrent upstream GETs share one request
+mls_flight = SingleFlight("mls")
+
+# Admission, retries and circuit breaking for every MLS request
+mls_governor = UpstreamGovernor(
+    "mls",
+    limiter=AdaptiveLimiter(
+        "mls.concurrency",
+        initial=MLS_CONCURRENCY_INITIAL,
+        min_limit=MLS_CONCURRENCY_MIN,
+        max_limit=MLS_CONCURRENCY_MAX,
+        latency_target=MLS_LATENCY_TARGET
+    ),
+    breaker=CircuitBreaker(
+        "mls.breaker",
+        failure_ratio=MLS_BREAKER_FAILURE_RATIO,
+        min_calls=MLS_BREAKER_MIN_CALLS,
+        window=MLS_BREAKER_WINDOW,
+        open_seconds=MLS_BREAKER_OPEN_SECONDS
+    ),
+    budget=RetryBudget(MLS_RETRY_BUDGET_RATIO, MLS_RETRY_BUDGET_MIN_PER_SECOND),
+    max_attempts=MLS_RETRY_MAX_ATTEMPTS,
+    base_delay=MLS_RETRY_BASE_DELAY,
+    max_delay=MLS_RETRY_MAX_DELAY,
+    max_retry_after=MLS_RETRY_AFTER_MAX
+)
+
+def _build_hedge_policies(spec: str) -> Dict[str, HedgePolicy]:
+    """Parse MLS_HEDGE_CALL_TYPES into one HedgePolicy per call type"""
+    policies: Dict[str, HedgePolicy] = {}
+    for item in spec.split(","):
+        call_type, _, percentile = item.strip().partition(":")
+        if not call_type:
+            continue
         try:
-            response = await client.get(
-                f"{MLS_API_URL}/Media?$filter=ResourceRecordKey eq '{listing_key}'",
-                headers={
-                    "Authorization": f"Bearer {MLS_AUTH_TOKEN}",
-                    "Accept": "application/json"
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            media_data = response.json().get("value", [])
-            preferred = [item for item in media_data if item.get("PreferredPhotoYN") and item.get("ImageSizeDescription") == "Largest"]
-            if preferred:
-                return [item.get("MediaURL", "") for item in preferred if item.get("MediaURL")]
-            # fallback to all largest
-            largest = [item for item in media_data if item.get("ImageSizeDescription") == "Largest"]
-            return [item.get("MediaURL", "") for item in largest if item.get("MediaURL")]
-        except Exception as e:
-            print(f"Error fetching media for {listing_key}: {e}")
-            return []
+            percentile_value = float(percentile) if percentile else 0.95
+        except ValueError:
+            print(f"Warning: invalid hedge percentile for {call_type}: {percentile}")
+            continue
+        policies[call_type] = HedgePolicy(
+            f"mls.{call_type}",
+            percentile=percentile_value,
+            budget=RetryBudget(MLS_HEDGE_BUDGET_RATIO, 0.0),
+            min_delay=MLS_HEDGE_MIN_DELAY,
+            max_delay=MLS_HEDGE_MAX_DELAY,
+            window=MLS_HEDGE_WINDOW,
+            min_samples=MLS_HEDGE_MIN_SAMPLES
+        )
+    return policies
+
+# Call type -> hedge policy; call types not listed are never hedged
+mls_hedges = _build_hedge_policies(MLS_HEDGE_CALL_TYPES)
+
+def _build_mls_client() -> httpx.AsyncClient:
+    """Build the pooled MLS client used by every property code path"""
+    http2 = MLS_HTTP2 and http2_available()
+    if MLS_HTTP2 and not http2:
+        print("Warning: h2 not installed, MLS client falling back to HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=MLS_MAX_CONNECTIONS,
+            max_keepalive_connections=MLS_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=MLS_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            MLS_READ_TIMEOUT,
+            connect=MLS_CONNECT_TIMEOUT,
+            pool=MLS_POOL_TIMEOUT
+        ),
+        headers={
+            "Authorization": f"Bearer {MLS_AUTH_TOKEN}",
+            "Accept": "application/json"
+        }
+    )
+
+async def start_mls_client() -> httpx.AsyncClient:
+    """Open the shared MLS client (called from the app lifespan)"""
+    global _mls_client
+    if _mls_client is None or _mls_client.is_closed:
+        _mls_client = _build_mls_client()
+    return _mls_client
+
+async def close_mls_client():
+    """Close the shared MLS client and release pooled connections"""
+    global _mls_client
+    if _mls_client is not None:
+        await _mls_client.aclose()
+        _mls_client = None
+
+def get_mls_client() -> httpx.AsyncClient:
+    """Return the shared MLS client, creating it lazily outside the app lifespan"""
+    global _mls_client
+    if _mls_client is None or _mls_client.is_closed:
+        _mls_client = _build_mls_client()
+    return _mls_client
+
+def normalize_mls_url(url: str) -> str:
+    """Normalize an OData URL into a cache key.
+
+    Query options are sorted, whitespace collapsed and the top-level 'and'
+    clauses of $filter (as built by build_filter_str) put in a stable order.
+    """
+    parsed = httpx.URL(url)
+    params = []
+    for name, value in sorted(parsed.params.multi_items()):
+        value = " ".join(value.split())
+        if name == "$filter" and " or " not in value:
+            value = " and ".join(sorted(value.split(" and ")))
+        params.append(f"{name}={value}")
+    return f"{parsed.path}?{'&'.join(params)}"
+
+async def _get_mls_json(url: str, call_type: Optional[str] = None) -> dict:
+    response = await mls_governor.request(lambda: get_mls_client().get(url), hedge=mls_hedges.get(call_type))
+    response.raise_for_status()
+    return response.json()
+
+async def request_mls_json(url: str, call_type: Optional[str] = None) -> dict:
+    """GET an MLS OData URL over the shared client and return the decoded body.
+
+    Concurrent requests for the same normalized URL are coalesced into one,
+    and every request goes through mls_governor. Raises UpstreamUnavailable
+    while the circuit is open. ``call_type`` selects the hedge policy from
+    MLS_HEDGE_CALL_TYPES, if any.
+    """
+    return await mls_flight.do(normalize_mls_url(url), lambda: _get_mls_json(url, call_type))
+
+def remember_mls(key: str, value, ttl: Optional[float] = None):
+    """Cache a value fresh for ``ttl`` and keep it as the stale-if-error fallback"""
+    mls_cache.set(key, value, ttl)
+    mls_stale_cache.set(key, value)
+
+def stale_mls(key: str):
+    """Last good value for a key, or None; counted as a stale serve when found"""
+    value = mls_stale_cache.get(key) if MLS_CACHE_ENABLED else None
+    if value is not None:
+        metrics.incr("mls.stale_served")
+    return value
+
+async def fetch_mls_json(url: str, ttl: Optional[float] = None, call_type: Optional[str] = None) -> dict:
+    """Cached variant of request_mls_json keyed by the normalized URL.
+
+    When MLS fails or the circuit is open, the last good response for the
+    URL is served if one is younger than MLS_STALE_IF_ERROR_TTL.
+    """
+    if not MLS_CACHE_ENABLED:
+        return await request_mls_json(url, call_type)
+    key = normalize_mls_url(url)
+
+    async def load() -> dict:
+        data = await request_mls_json(url, call_type)
+        mls_stale_cache.set(key, data)
+        return data
+
+    try:
+        return await mls_cache.get_or_load(key, load, ttl)
+    except (UpstreamUnavailable, httpx.HTTPError):
+        data = stale_mls(key)
+        if data is None:
+            raise
+        return data
+
+def select_preferred_largest(media_data: List[dict]) -> List[str]:
+    """Pick preferred largest image URLs, falling back to all largest images"""
+    preferred = [item for item in media_data if item.get("PreferredPhotoYN") and item.get("ImageSizeDescription") == "Largest"]
+    if preferred:
+        return [item.get("MediaURL", "") for item in preferred if item.get("MediaURL")]
+    # fallback to all largest
+    return select_largest(media_data)
+
+def select_largest(media_data: List[dict]) -> List[str]:
+    """Pick all largest image URLs"""
+    largest = [item for item in media_data if item.get("ImageSizeDescription") == "Largest"]
+    return [item.get("MediaURL", "") for item in largest if item.get("MediaURL")]
 
 async def fetch_largest_media(listing_key: str):
-    """Fetch all largest images for a specific property"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{MLS_API_URL}/Media?$filter=ResourceRecordKey eq '{listing_key}'",
-                headers={
-                    "Authorization": f"Bearer {MLS_AUTH_TOKEN}",
-                    "Accept": "application/json"
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            media_data = response.json().get("value", [])
-            largest = [item for item in media_data if item.get("ImageSizeDescription") == "Largest"]
-            return [item.get("MediaURL", "") for item in largest if item.get("MediaURL")]
-        except Exception as e:
-            print(f"Error fetching media for {listing_key}: {e}")
-            return [] 
\ No newline at end of file
+    """Fetch all largest images for a specific property.
+
+    Serves the last good media when MLS fails; without one, raises
+    UpstreamUnavailable or the httpx error rather than returning no images.
+    """
+    data = await fetch_mls_json(
+        f"{MLS_API_URL}/Media?$filter=ResourceRecordKey eq '{listing_key}'",
+        ttl=MLS_MEDIA_CACHE_TTL,
+        call_type="media"
+    )
+    return select_largest(data.get("value", []))
+
+def build_key_filter(field: str, keys: List[str]) -> str:
+    """Build an OData membership filter for a set of keys"""
+    if MLS_ODATA_IN_OPERATOR:
+        quoted = ",".join(f"'{key}'" for key in keys)
+        return f"{field} in ({quoted})"
+    return "(" + " or ".join(f"{field} eq '{key}'" for key in keys) + ")"
+
+def chunk_keys_for_url(base_url: str, field: str, keys: List[str], extra_filter: str = "") -> List[List[str]]:
+    """Split keys into chunks whose encoded filter URL stays under MLS_MAX_URL_LENGTH"""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    for key in keys:
+        candidate = current + [key]
+        url = f"{base_url}&$filter={build_key_filter(field, candidate)}{extra_filter}"
+        if current and len(str(httpx.URL(url))) > MLS_MAX_URL_LENGTH:
+            chunks.append(current)
+            current = [key]
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def fetch_mls_pages(url: str) -> List[dict]:
+    """Fetch an OData query and follow @odata.nextLink until exhausted"""
+    rows: List[dict] = []
+    next_url: Optional[str] = url
+    while next_url:
+        data = await request_mls_json(next_url)
+        rows.extend(data.get("value", []))
+        next_url = data.get("@odata.nextLink")
+    return rows
+
+async def fetch_properties_batch(listing_keys: Iterable[str]) -> Dict[str, dict]:
+    """Fetch Property records for many ListingKeys with a few chunked OData queries.
+
+    Fresh cached records are reused and fetched ones are cached per listing.
+    Listings in a chunk that fails fall back to their last good record; if
+    any of them has none, the chunk's UpstreamUnavailable or httpx error is
+    raised, so a failure is never mistaken for listings that are gone.
+    """
+    keys = list(dict.fromkeys(key for key in listing_keys if key))
+    properties: Dict[str, dict] = {}
+    missing: List[str] = []
+    for key in keys:
+        cached = mls_cache.get(f"property:{key}") if MLS_CACHE_ENABLED else None
+        if cached is not None:
+            properties[key] = cached
+        else:
+            missing.append(key)
+    if not missing:
+        return properties
+
+    base_url = f"{MLS_API_URL}/Property?$top={MLS_MEDIA_PAGE_SIZE}"
+    semaphore = asyncio.Semaphore(MLS_PROPERTY_BATCH_CONCURRENCY)
+
+    async def fetch_chunk(chunk: List[str]) -> Tuple[List[str], List[dict], Optional[Exception]]:
+        url = f"{base_url}&$filter={build_key_filter('ListingKey', chunk)}"
+        async with semaphore:
+            try:
+                return chunk, await fetch_mls_pages(url), None
+            except (UpstreamUnavailable, httpx.HTTPError) as e:
+                return chunk, [], e
+
+    chunks = chunk_keys_for_url(base_url, "ListingKey", missing)
+    for chunk, rows, error in await asyncio.gather(*[fetch_chunk(chunk) for chunk in chunks]):
+        for row in rows:
+            key = row.get("ListingKey")
+            if key:
+                properties[key] = row
+                if MLS_CACHE_ENABLED:
+                    remember_mls(f"property:{key}", row)
+        if error is not None:
+            for key in chunk:
+                stale = stale_mls(f"property:{key}")
+                if stale is None:
+                    raise error
+                properties[key] = stale
+    return properties
+
+async def iter_media_batches(listing_keys: Iterable[str]) -> AsyncIterator[Dict[str, List[dict]]]:
+    """Yield largest media grouped by ListingKey as each chunked OData query completes.
+
+    Listings with fresh cached media come first, in one batch, without an
+    upstream call. Listings in a chunk that fails map to their last good
+    media; if any of them has none, the chunk's error is raised, like
+    fetch_largest_media.
+    """
+    keys = list(dict.fromkeys(key for key in listing_keys if key))
+    cached_media: Dict[str, List[dict]] = {}
+    missing: List[str] = []
+    for key in keys:
+        cached = mls_cache.get(f"media:{key}") if MLS_CACHE_ENABLED else None
+        if cached is not None:
+            cached_media[key] = cached
+        else:
+            missing.append(key)
+    if cached_media:
+        yield cached_media
+    if not missing:
+        return
+
+    base_url = f"{MLS_API_URL}/Media?$top={MLS_MEDIA_PAGE_SIZE}"
+    if MLS_PROPERTY_IMAGE_FILTER_FIELDS:
+        base_url += f"&$select={MLS_PROPERTY_IMAGE_FILTER_FIELDS}"
+    size_filter = " and ImageSizeDescription eq 'Largest'"
+    chunks = chunk_keys_for_url(base_url, "ResourceRecordKey", missing, size_filter)
+    semaphore = asyncio.Semaphore(MLS_MEDIA_BATCH_CONCURRENCY)
+
+    async def fetch_chunk(chunk: List[str]) -> Tuple[List[str], List[dict], Optional[Exception]]:
+        url = f"{base_url}&$filter={build_key_filter('ResourceRecordKey', chunk)}{size_filter}"
+        async with semaphore:
+            try:
+                return chunk, await fetch_mls_pages(url), None
+            except (UpstreamUnavailable, httpx.HTTPError) as e:
+                return chunk, [], e
+
+    tasks = [asyncio.ensure_future(fetch_chunk(chunk)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            chunk, rows, error = await next_done
+            fetched: Dict[str, List[dict]] = {key: [] for key in chunk}
+            for item in rows:
+                key = item.get("ResourceRecordKey")
+                if key in fetched:
+                    fetched[key].append(item)
+            for key, items in fetched.items():
+                if error is not None:
+                    stale = stale_mls(f"media:{key}")
+                    if stale is None:
+                        raise error
+                    fetched[key] = stale
+                    continue
+                # Keep the MLS display order within each listing
+                items.sort(key=lambda item: item.get("Order") or 0)
+                if MLS_CACHE_ENABLED:
+                    remember_mls(f"media:{key}", items, MLS_MEDIA_CACHE_TTL)
+            yield fetched
+    finally:
+        # The consumer may stop early (e.g. a client disconnecting from a stream)
+        for task in tasks:
+            task.cancel()
+
+async def fetch_media_batch(listing_keys: Iterable[str]) -> Dict[str, List[dict]]:
+    """Fetch largest media for many listings with a few chunked OData queries"""
+    media_by_key: Dict[str, List[dict]] = {}
+    async for batch in iter_media_batches(listing_keys):
+        media_by_key.update(batch)
+    return media_by_key
@@ -0,0 +1,107 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+# (min_lat, min_lng, max_lat, max_lng)
+BBox = Tuple[float, float, float, float]
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distance in km from one point to arrays of points"""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def radius_bbox(lat: float, lng: float, radius_km: float) -> BBox:
+    """Bounding box that contains the circle of radius_km around a point"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+def parse_bbox(value: str) -> BBox:
+    """Parse 'min_lng,min_lat,max_lng,max_lat' (GeoJSON order) into a BBox"""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be 'min_lng,min_lat,max_lng,max_lat'")
+    if min_lat > max_lat or min_lng > max_lng:
+        raise ValueError("bbox minimums must not exceed maximums")
+    return min_lat, min_lng, max_lat, max_lng
+
+
+class GeoGrid:
+    """Uniform lat/lng grid over point coordinates.
+
+    Rows are sorted by cell id (row-major), so every grid row of a bounding
+    box is one contiguous slice found with two binary searches. Rows without
+    coordinates are left out.
+    """
+
+    def __init__(self, lats: np.ndarray, lngs: np.ndarray, cell_degrees: float = 0.01):
+        self.lats = lats
+        self.lngs = lngs
+        self.cell = cell_degrees
+        self.columns = int(math.ceil(360 / cell_degrees)) + 1
+        located = np.flatnonzero(~(np.isnan(lats) | np.isnan(lngs)))
+        # (0, 0) is what listings without coordinates used to carry
+        located = located[(lats[located] != 0) | (lngs[located] != 0)]
+        cells = self._cell_ids(lats[located], lngs[located])
+        order = np.argsort(cells, kind="stable")
+        self.rows = located[order]
+        self.cells = cells[order]
+
+    def _cell_x(self, lngs):
+        return np.floor((np.asarray(lngs) + 180) / self.cell).astype(np.int64)
+
+    def _cell_y(self, lats):
+        return np.floor((np.asarray(lats) + 90) / self.cell).astype(np.int64)
+
+    def _cell_ids(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        return self._cell_y(lats) * self.columns + self._cell_x(lngs)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def within_bbox(self, bbox: BBox) -> np.ndarray:
+        """Row ids inside the bounding box"""
+        min_lat, min_lng, max_lat, max_lng = bbox
+        x0, x1 = int(self._cell_x(min_lng)), int(self._cell_x(max_lng))
+        y0, y1 = int(self._cell_y(min_lat)), int(self._cell_y(max_lat))
+        if (y1 - y0 + 1) * 2 > len(self.rows):
+            # Huge boxes: filtering everything is cheaper than walking grid rows
+            candidates = self.rows
+        else:
+            starts = np.arange(y0, y1 + 1) * self.columns
+            lo = np.searchsorted(self.cells, starts + x0, side="left")
+            hi = np.searchsorted(self.cells, starts + x1, side="right")
+            if not len(lo):
+                return np.empty(0, dtype=np.int64)
+            candidates = np.concatenate([self.rows[a:b] for a, b in zip(lo, hi)])
+        lats, lngs = self.lats[candidates], self.lngs[candidates]
+        inside = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+        return candidates[inside]
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids within radius_km of a point and their distances, nearest first"""
+        candidates = self.within_bbox(radius_bbox(lat, lng, radius_km))
+        distances = haversine_km(lat, lng, self.lats[candidates], self.lngs[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, lat: float, lng: float, count: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """The count nearest rows (optionally only rows set in mask), by widening the search radius"""
+        radius_km = self.cell * KM_PER_DEGREE_LAT
+        while True:
+            rows, distances = self.within_radius(lat, lng, radius_km)
+            if mask is not None:
+                keep = mask[rows]
+                rows, distances = rows[keep], distances[keep]
+            if len(rows) >= count or radius_km > 2 * math.pi * EARTH_RADIUS_KM:
+                return rows[:count], distances[:count]
+            radius_km *= 2
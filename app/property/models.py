@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class Coordinates(BaseModel):
     lat: float
@@ -27,4 +27,29 @@ class Property(BaseModel):
     images: List[str]
     amenities: List[str]
     createdAt: str
-    updatedAt: str 
\ No newline at end of file
+    updatedAt: str 
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBucket(BaseModel):
+    min: float
+    max: float
+    count: int
+
+class PriceFacet(BaseModel):
+    min: Optional[float]
+    max: Optional[float]
+    histogram: List[PriceBucket]
+
+class PropertyFacets(BaseModel):
+    total: int
+    cities: List[FacetCount]
+    propertyTypes: List[FacetCount]
+    bedrooms: List[FacetCount]
+    bathrooms: List[FacetCount]
+    price: PriceFacet
+
+class PropertyIds(BaseModel):
+    property_ids: List[str] = Field(..., min_length=1)
@@ -0,0 +1,544 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .clients import (
+    MLS_API_URL,
+    MLS_BASE_FILTERS,
+    MLS_CONFIGURED,
+    build_key_filter,
+    chunk_keys_for_url,
+    request_mls_json
+)
+
+# Replica configuration
+MLS_REPLICA_ENABLED = os.getenv("MLS_REPLICA_ENABLED", "false").lower() == "true"
+MLS_REPLICA_PATH = os.getenv("MLS_REPLICA_PATH", "data/listings.sqlite")
+MLS_REPLICA_SYNC_INTERVAL = float(os.getenv("MLS_REPLICA_SYNC_INTERVAL", 300))
+MLS_REPLICA_FULL_RESYNC_INTERVAL = float(os.getenv("MLS_REPLICA_FULL_RESYNC_INTERVAL", 86400))
+MLS_REPLICA_PAGE_SIZE = int(os.getenv("MLS_REPLICA_PAGE_SIZE", 500))
+# How often workers that do not hold the sync lease check for a finished sync
+MLS_REPLICA_POLL_INTERVAL = float(os.getenv("MLS_REPLICA_POLL_INTERVAL", 30))
+
+PROPERTY_RESOURCE = "Property"
+MEDIA_RESOURCE = "Media"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS properties (
+    listing_key TEXT PRIMARY KEY,
+    modified TEXT,
+    city TEXT,
+    price REAL,
+    beds INTEGER,
+    baths INTEGER,
+    generation INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_properties_price ON properties (price);
+CREATE TABLE IF NOT EXISTS media (
+    media_key TEXT PRIMARY KEY,
+    listing_key TEXT NOT NULL,
+    sort_order INTEGER,
+    generation INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_media_listing ON media (listing_key);
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    watermark TEXT,
+    last_key TEXT,
+    full_started_at REAL,
+    completed_full INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS sync_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT,
+    expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS sync_runs (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    run INTEGER NOT NULL
+);
+"""
+
+class SyncLeaseLost(Exception):
+    """Another worker took over the sync lease mid-run"""
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class ListingStore:
+    """SQLite copy of the MLS Property and Media resources.
+
+    Raw MLS records are kept as JSON next to the few columns the property
+    search filters on. Page writes and their sync checkpoint commit in one
+    transaction, so a crashed sync resumes from the last committed page.
+    Reads use their own WAL connection and lock, so they never wait for a
+    page write to commit.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._read_lock = threading.Lock()
+        self._read_conn = sqlite3.connect(path, check_same_thread=False)
+        self._ready = False
+
+    def close(self):
+        with self._read_lock:
+            self._read_conn.close()
+        with self._lock:
+            self._conn.close()
+
+    # Sync state
+
+    def get_state(self, resource: str) -> Optional[dict]:
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT mode, generation, watermark, last_key, full_started_at, completed_full "
+                "FROM sync_state WHERE resource = ?",
+                (resource,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "mode": row[0],
+            "generation": row[1],
+            "watermark": row[2],
+            "last_key": row[3],
+            "full_started_at": row[4],
+            "completed_full": bool(row[5])
+        }
+
+    def save_state(self, resource: str, state: dict):
+        with self._lock, self._conn:
+            self._write_state(resource, state)
+
+    def _write_state(self, resource: str, state: dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sync_state "
+            "(resource, mode, generation, watermark, last_key, full_started_at, completed_full, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                resource, state["mode"], state["generation"], state.get("watermark"),
+                state.get("last_key"), state.get("full_started_at"),
+                int(state.get("completed_full", False)), time.time()
+            )
+        )
+
+    def is_ready(self) -> bool:
+        """True once an initial full Property load has completed"""
+        if not self._ready:
+            state = self.get_state(PROPERTY_RESOURCE)
+            self._ready = bool(state and state["completed_full"])
+        return self._ready
+
+    def try_acquire_lease(self, owner: str, ttl: float) -> bool:
+        """Let only one worker process run the sync at a time"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO sync_lease (id, owner, expires_at) VALUES (1, NULL, 0)")
+            cursor = self._conn.execute(
+                "UPDATE sync_lease SET owner = ?, expires_at = ? "
+                "WHERE id = 1 AND (owner = ? OR owner IS NULL OR expires_at < ?)",
+                (owner, now + ttl, owner, now)
+            )
+            return cursor.rowcount == 1
+
+    def mark_synced(self):
+        """Count a finished sync pass, so every worker process can see it"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sync_runs (id, run) VALUES (1, 1) "
+                "ON CONFLICT (id) DO UPDATE SET run = run + 1"
+            )
+
+    def last_sync_run(self) -> int:
+        with self._read_lock:
+            row = self._read_conn.execute("SELECT run FROM sync_runs WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    # Writes
+
+    def _known_listing_keys(self, listing_keys: Iterable[str]) -> set:
+        keys = list(listing_keys)
+        known = set()
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            known.update(row[0] for row in self._conn.execute(
+                f"SELECT listing_key FROM properties WHERE listing_key IN ({placeholders})", chunk
+            ))
+        return known
+
+    def write_property_page(self, records: List[dict], resource_state: dict) -> List[str]:
+        """Upsert a page of Property records and checkpoint; returns newly added keys"""
+        generation = resource_state["generation"]
+        with self._lock, self._conn:
+            keys = [record["ListingKey"] for record in records if record.get("ListingKey")]
+            existing = self._known_listing_keys(keys)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO properties "
+                "(listing_key, modified, city, price, beds, baths, generation, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        record["ListingKey"],
+                        record.get("ModificationTimestamp"),
+                        record.get("City"),
+                        _to_float(record.get("ListPrice")),
+                        _to_int(record.get("BedroomsTotal")),
+                        _to_int(record.get("BathroomsTotalInteger")),
+                        generation,
+                        json.dumps(record)
+                    )
+                    for record in records if record.get("ListingKey")
+                ]
+            )
+            self._write_state(PROPERTY_RESOURCE, resource_state)
+        return [key for key in keys if key not in existing]
+
+    def write_media_page(self, records: List[dict], resource_state: Optional[dict] = None):
+        """Upsert media for listings we hold and optionally checkpoint"""
+        with self._lock, self._conn:
+            generation = resource_state["generation"] if resource_state else 0
+            known = self._known_listing_keys(
+                {record.get("ResourceRecordKey") for record in records if record.get("ResourceRecordKey")}
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO media (media_key, listing_key, sort_order, generation, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        record["MediaKey"],
+                        record["ResourceRecordKey"],
+                        _to_int(record.get("Order")) or 0,
+                        generation,
+                        json.dumps(record)
+                    )
+                    for record in records
+                    if record.get("MediaKey") and record.get("ResourceRecordKey") in known
+                ]
+            )
+            if resource_state is not None:
+                self._write_state(MEDIA_RESOURCE, resource_state)
+
+    def replace_media(self, media_by_key: Dict[str, List[dict]], generation: int, resource_state: Optional[dict] = None):
+        """Replace the media set of the given listings and optionally checkpoint"""
+        with self._lock, self._conn:
+            for listing_key, records in media_by_key.items():
+                self._conn.execute("DELETE FROM media WHERE listing_key = ?", (listing_key,))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO media (media_key, listing_key, sort_order, generation, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (record["MediaKey"], listing_key, _to_int(record.get("Order")) or 0, generation, json.dumps(record))
+                        for record in records if record.get("MediaKey")
+                    ]
+                )
+            if resource_state is not None:
+                self._write_state(MEDIA_RESOURCE, resource_state)
+
+    def drop_older_generations(self, resource: str, generation: int):
+        """Remove rows a completed full load didn't see (delisted or filtered out)"""
+        with self._lock, self._conn:
+            if resource == PROPERTY_RESOURCE:
+                self._conn.execute("DELETE FROM properties WHERE generation < ?", (generation,))
+                self._conn.execute(
+                    "DELETE FROM media WHERE listing_key NOT IN (SELECT listing_key FROM properties)"
+                )
+            else:
+                self._conn.execute("DELETE FROM media WHERE generation < ? AND generation > 0", (generation,))
+
+    # Reads
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._read_conn.execute("SELECT COUNT(*) FROM properties").fetchone()[0]
+
+    def listing_keys(self, after: Optional[str] = None) -> List[str]:
+        """Every ListingKey held, in key order, optionally only those after ``after``"""
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT listing_key FROM properties WHERE listing_key > ? ORDER BY listing_key", (after or "",)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_property(self, listing_key: str) -> Optional[dict]:
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT data FROM properties WHERE listing_key = ?", (listing_key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_properties(self, listing_keys: Iterable[str]) -> Dict[str, dict]:
+        keys = list(listing_keys)
+        found: Dict[str, dict] = {}
+        with self._read_lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                for key, data in self._read_conn.execute(
+                    f"SELECT listing_key, data FROM properties WHERE listing_key IN ({placeholders})", chunk
+                ):
+                    found[key] = json.loads(data)
+        return found
+
+    def iter_properties(self) -> List[dict]:
+        with self._read_lock:
+            rows = self._read_conn.execute("SELECT data FROM properties").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def media_for(self, listing_keys: Iterable[str]) -> Dict[str, List[dict]]:
+        keys = list(listing_keys)
+        media_by_key: Dict[str, List[dict]] = {key: [] for key in keys}
+        with self._read_lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                for key, data in self._read_conn.execute(
+                    f"SELECT listing_key, data FROM media WHERE listing_key IN ({placeholders}) "
+                    "ORDER BY listing_key, sort_order",
+                    chunk
+                ):
+                    media_by_key[key].append(json.loads(data))
+        return media_by_key
+
+
+class ListingSyncWorker:
+    """Background sync of the MLS Property and Media resources into a ListingStore.
+
+    The first run (and every MLS_REPLICA_FULL_RESYNC_INTERVAL) is a full load;
+    in between only records with a newer ModificationTimestamp are pulled.
+    Paging is keyset based on (ModificationTimestamp, key), so ``base_url`` and
+    ``fetch_json`` can point at any OData server, including a local fake.
+    """
+
+    def __init__(
+        self,
+        store: ListingStore,
+        base_url: Optional[str] = None,
+        fetch_json: Callable[[str], Awaitable[dict]] = request_mls_json,
+        page_size: int = MLS_REPLICA_PAGE_SIZE,
+        interval: float = MLS_REPLICA_SYNC_INTERVAL,
+        full_resync_interval: float = MLS_REPLICA_FULL_RESYNC_INTERVAL
+    ):
+        self.store = store
+        self.base_url = base_url or MLS_API_URL
+        self.fetch_json = fetch_json
+        self.page_size = page_size
+        self.interval = interval
+        self.full_resync_interval = full_resync_interval
+        self.owner = uuid.uuid4().hex
+        self.lease_ttl = interval * 2
+        self.listeners: List[Callable[[], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _renew_lease(self):
+        """Extend the lease before each write, and stop if another worker holds it"""
+        if not await asyncio.to_thread(self.store.try_acquire_lease, self.owner, self.lease_ttl):
+            raise SyncLeaseLost("sync lease held by another worker")
+
+    def _page_url(self, resource: str, key_field: str, filters: List[str], state: dict) -> str:
+        filters = list(filters)
+        watermark, last_key = state.get("watermark"), state.get("last_key")
+        if watermark:
+            filters.append(
+                f"(ModificationTimestamp gt {watermark} or "
+                f"(ModificationTimestamp eq {watermark} and {key_field} gt '{last_key or ''}'))"
+            )
+        return (
+            f"{self.base_url}/{resource}?$top={self.page_size}"
+            f"&$orderby=ModificationTimestamp,{key_field}"
+            f"&$filter={' and '.join(filters)}"
+        )
+
+    def _next_state(self, resource: str) -> dict:
+        """Resume an interrupted run, or start a full or incremental one"""
+        state = self.store.get_state(resource)
+        if state is None:
+            return {"mode": "full", "generation": 1, "watermark": None, "last_key": None,
+                    "full_started_at": time.time(), "completed_full": False}
+        if state["mode"] == "full":
+            return state
+        if time.time() - (state["full_started_at"] or 0) >= self.full_resync_interval:
+            return dict(state, mode="full", generation=state["generation"] + 1,
+                        watermark=None, last_key=None, full_started_at=time.time())
+        return state
+
+    async def _sync_resource(self, resource: str, key_field: str, filters: List[str], write_page) -> int:
+        state = self._next_state(resource)
+        total = 0
+        while True:
+            data = await self.fetch_json(self._page_url(resource, key_field, filters, state))
+            records = data.get("value", [])
+            # Only an empty page ends the run: servers may cap pages below
+            # $top, and a truncated full load would sweep the missed rows
+            if not records:
+                break
+            last = records[-1]
+            state = dict(state, watermark=last.get("ModificationTimestamp"), last_key=last.get(key_field))
+            await self._renew_lease()
+            await write_page(records, state)
+            total += len(records)
+        if state["mode"] == "full":
+            await asyncio.to_thread(self.store.drop_older_generations, resource, state["generation"])
+            state = dict(state, mode="incremental", completed_full=True)
+            await asyncio.to_thread(self.store.save_state, resource, state)
+        return total
+
+    async def _write_property_page(self, records: List[dict], state: dict):
+        added = await asyncio.to_thread(self.store.write_property_page, records, state)
+        if added and state["mode"] == "incremental":
+            # Listings new to the replica may have media older than the Media watermark
+            await self._backfill_media(added)
+
+    async def _iter_media_chunks(self, listing_keys: List[str]) -> AsyncIterator[Dict[str, List[dict]]]:
+        """Largest media for the given listings, one ResourceRecordKey chunk at a time"""
+        base_url = f"{self.base_url}/Media?$top={self.page_size}"
+        extra_filter = " and ImageSizeDescription eq 'Largest'"
+        for chunk in chunk_keys_for_url(base_url, "ResourceRecordKey", listing_keys, extra_filter):
+            url = f"{base_url}&$filter={build_key_filter('ResourceRecordKey', chunk)}{extra_filter}"
+            media_by_key: Dict[str, List[dict]] = {key: [] for key in chunk}
+            while url:
+                data = await self.fetch_json(url)
+                for record in data.get("value", []):
+                    if record.get("ResourceRecordKey") in media_by_key:
+                        media_by_key[record["ResourceRecordKey"]].append(record)
+                url = data.get("@odata.nextLink")
+            yield media_by_key
+
+    async def _backfill_media(self, listing_keys: List[str]):
+        media_by_key: Dict[str, List[dict]] = {}
+        async for chunk_media in self._iter_media_chunks(listing_keys):
+            media_by_key.update(chunk_media)
+        await self._renew_lease()
+        await asyncio.to_thread(self.store.replace_media, media_by_key, 0)
+
+    async def _write_media_page(self, records: List[dict], state: dict):
+        await asyncio.to_thread(self.store.write_media_page, records, state)
+
+    async def _sync_media(self) -> int:
+        """Sync largest media for the listings the replica holds.
+
+        A full load replaces each listing's media set in ResourceRecordKey
+        chunks and checkpoints the last listing done in ``last_key``. An
+        incremental pass pages Media on its own ModificationTimestamp
+        watermark, like Property, keeping only media of held listings.
+        """
+        state = self._next_state(MEDIA_RESOURCE)
+        if state["mode"] != "full":
+            return await self._sync_resource(
+                MEDIA_RESOURCE, "MediaKey", ["ImageSizeDescription eq 'Largest'"], self._write_media_page
+            )
+        keys = await asyncio.to_thread(self.store.listing_keys, state.get("last_key"))
+        watermark = state.get("watermark")
+        total = 0
+        async for media_by_key in self._iter_media_chunks(keys):
+            records = [record for items in media_by_key.values() for record in items]
+            for record in records:
+                modified = record.get("ModificationTimestamp")
+                if modified and (watermark is None or modified > watermark):
+                    watermark = modified
+            total += len(records)
+            await self._renew_lease()
+            state = dict(state, watermark=watermark, last_key=max(media_by_key))
+            await asyncio.to_thread(self.store.replace_media, media_by_key, state["generation"], state)
+        await asyncio.to_thread(self.store.drop_older_generations, MEDIA_RESOURCE, state["generation"])
+        state = dict(state, mode="incremental", completed_full=True, watermark=watermark, last_key=None)
+        await asyncio.to_thread(self.store.save_state, MEDIA_RESOURCE, state)
+        return total
+
+    async def sync_once(self) -> Dict[str, int]:
+        """Run one Property then Media sync pass"""
+        properties = await self._sync_resource(
+            PROPERTY_RESOURCE, "ListingKey", MLS_BASE_FILTERS, self._write_property_page
+        )
+        media = await self._sync_media()
+        await asyncio.to_thread(self.store.mark_synced)
+        for listener in self.listeners:
+            await listener()
+        return {"properties": properties, "media": media}
+
+    async def run(self):
+        while True:
+            try:
+                if await asyncio.to_thread(self.store.try_acquire_lease, self.owner, self.lease_ttl):
+                    counts = await self.sync_once()
+                    print(f"Listing replica synced: {counts}")
+            except asyncio.CancelledError:
+                raise
+            except SyncLeaseLost:
+                print("Listing replica sync stopped: lease taken by another worker")
+            except Exception as e:
+                print(f"Error syncing listing replica: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+listing_store: Optional[ListingStore] = None
+sync_worker: Optional[ListingSyncWorker] = None
+
+def get_replica() -> Optional[ListingStore]:
+    """Return the listing store once it can serve reads, else None"""
+    if listing_store is not None and listing_store.is_ready():
+        return listing_store
+    return None
+
+async def start_replica():
+    """Open the listing store and start the sync worker (called from the app lifespan)"""
+    global listing_store, sync_worker
+    if not MLS_REPLICA_ENABLED or listing_store is not None:
+        return
+    if not MLS_CONFIGURED:
+        print("Warning: MLS_REPLICA_ENABLED is set but MLS is not configured; replica disabled")
+        return
+    listing_store = ListingStore(MLS_REPLICA_PATH)
+    sync_worker = ListingSyncWorker(listing_store)
+    sync_worker.start()
+
+async def stop_replica():
+    global listing_store, sync_worker
+    if sync_worker is not None:
+        await sync_worker.stop()
+        sync_worker = None
+    if listing_store is not None:
+        listing_store.close()
+        listing_store = None
@@ -0,0 +1,219 @@
+import os
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.property.api import hydrate_properties
+from core.cache import DiskCacheTier, TTLCache
+from core.database import SupabaseError, get_database, in_filter
+from core.etag import make_etag
+
+# Supabase tables backing the cart and wishlist
+CART_TABLE = "cart"
+WISHLIST_TABLE = "wishlist"
+
+# Largest multi-select accepted by the bulk cart and wishlist endpoints
+SAVED_BULK_MAX_ITEMS = int(os.getenv("SAVED_BULK_MAX_ITEMS", 100))
+
+# Cart and wishlist rows are unique per user and listing
+SAVED_CONFLICT_COLUMNS = "user_id,property_id"
+
+# Per-user membership cache. Writes on this worker update it in place; the
+# TTL bounds how long another worker's writes can go unseen.
+SAVED_CACHE_ENABLED = os.getenv("SAVED_CACHE_ENABLED", "true").lower() == "true"
+SAVED_CACHE_TTL = float(os.getenv("SAVED_CACHE_TTL", 30))
+SAVED_CACHE_MAX_ENTRIES = int(os.getenv("SAVED_CACHE_MAX_ENTRIES", 10000))
+SAVED_CACHE_SHARED_PATH = os.getenv("SAVED_CACHE_SHARED_PATH", "")
+# Hydrated property cards shown in the cart and wishlist
+SAVED_CARD_CACHE_TTL = float(os.getenv("SAVED_CARD_CACHE_TTL", 120))
+SAVED_CARD_CACHE_MAX_ENTRIES = int(os.getenv("SAVED_CARD_CACHE_MAX_ENTRIES", 4096))
+# Listings that could not be found are looked up again after this long
+SAVED_MISSING_CARD_TTL = float(os.getenv("SAVED_MISSING_CARD_TTL", 30))
+
+membership_cache = TTLCache(
+    max_entries=SAVED_CACHE_MAX_ENTRIES,
+    ttl=SAVED_CACHE_TTL,
+    shared=DiskCacheTier(SAVED_CACHE_SHARED_PATH) if SAVED_CACHE_SHARED_PATH else None,
+    name="saved_membership"
+)
+
+# Cards are shared by every user who saved the listing: {"card": ..., "etag": ...}
+card_cache = TTLCache(
+    max_entries=SAVED_CARD_CACHE_MAX_ENTRIES,
+    ttl=SAVED_CARD_CACHE_TTL,
+    name="saved_cards"
+)
+
+# Bumped on every write, so a load that overlapped a write is not cached
+_writes = itertools.count()
+_write_seq = 0
+
+
+def membership_key(table: str, user_id: str) -> str:
+    return f"{table}:{user_id}"
+
+
+def _record_write(table: str, user_id: str, update) -> None:
+    """Apply a write to the cached rows, if this worker has a fresh copy.
+
+    The entry keeps its original expiry, so frequent writes never stretch
+    how long another worker's changes can go unseen.
+    """
+    global _write_seq
+    _write_seq = next(_writes)
+    membership_cache.replace(membership_key(table, user_id), update)
+
+
+async def saved_rows(table: str, user_id: str, auth: Optional[str] = None) -> List[Dict]:
+    """A user's cart or wishlist rows, served from the membership cache when fresh"""
+    key = membership_key(table, user_id)
+    if SAVED_CACHE_ENABLED:
+        rows = membership_cache.get(key)
+        if rows is not None:
+            return rows
+    seq = _write_seq
+    rows = await get_database().select(table, {"user_id": f"eq.{user_id}"}, auth=auth)
+    if SAVED_CACHE_ENABLED and seq == _write_seq:
+        membership_cache.set(key, rows)
+    return rows
+
+
+async def saved_cards(property_ids: List[str]) -> Dict[str, Tuple[dict, str]]:
+    """(card, etag) for each listing that exists, hydrating only those not cached"""
+    cards: Dict[str, Tuple[dict, str]] = {}
+    missing = []
+    for property_id in dict.fromkeys(property_ids):
+        cached = card_cache.get(f"card:{property_id}")
+        if cached is None:
+            missing.append(property_id)
+        elif cached["card"] is not None:
+            cards[property_id] = (cached["card"], cached["etag"])
+    if missing:
+        hydrated = await hydrate_properties(missing)
+        for property_id in missing:
+            card = hydrated.get(property_id)
+            if card is None:
+                # Remember briefly that the listing is gone, so views of it stay cheap
+                card_cache.set(f"card:{property_id}", {"card": None, "etag": None}, ttl=SAVED_MISSING_CARD_TTL)
+                continue
+            etag = make_etag(card)
+            card_cache.set(f"card:{property_id}", {"card": card, "etag": etag})
+            cards[property_id] = (card, etag)
+    return cards
+
+
+def saved_etag(table: str, user_id: str, rows: List[Dict], cards: Dict[str, Tuple[dict, str]]) -> str:
+    """ETag of a cart or wishlist view: its rows plus the version of each card shown"""
+    return make_etag(
+        table,
+        user_id,
+        [(row.get("id"), row["property_id"], cards[row["property_id"]][1] if row["property_id"] in cards else None)
+         for row in rows]
+    )
+
+
+def unique_ids(property_ids: List[str]) -> List[str]:
+    """Property ids in first-seen order without repeats, checked against the bulk limit"""
+    ids = list(dict.fromkeys(property_ids))
+    if len(ids) > SAVED_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {SAVED_BULK_MAX_ITEMS} properties per request")
+    return ids
+
+
+async def add_saved(table: str, user_id: str, property_ids: List[str], auth: Optional[str] = None) -> List[Dict]:
+    """Add listings to a user's cart or wishlist in one upsert, returning only the new rows.
+
+    Listings already saved are skipped by the database, not reported as errors.
+    """
+    rows = [{"user_id": user_id, "property_id": property_id} for property_id in property_ids]
+    try:
+        added = await get_database().upsert(
+            table, rows, on_conflict=SAVED_CONFLICT_COLUMNS, ignore_duplicates=True, auth=auth
+        )
+    except SupabaseError:
+        membership_cache.delete(membership_key(table, user_id))
+        raise
+    _record_write(table, user_id, lambda cached: cached + added)
+    return added
+
+
+async def remove_saved(table: str, user_id: str, property_ids: List[str], auth: Optional[str] = None) -> List[str]:
+    """Remove listings from a user's cart or wishlist in one delete, returning the ids removed"""
+    try:
+        rows = await get_database().delete(
+            table,
+            {"user_id": f"eq.{user_id}", "property_id": in_filter(property_ids)},
+            returning=True,
+            auth=auth
+        )
+    except SupabaseError:
+        membership_cache.delete(membership_key(table, user_id))
+        raise
+    removed = [row["property_id"] for row in rows]
+    _record_write(table, user_id, lambda cached: [row for row in cached if row["property_id"] not in removed])
+    return removed
+
+
+async def clear_saved(table: str, user_id: str, auth: Optional[str] = None) -> None:
+    """Empty a user's cart or wishlist"""
+    try:
+        await get_database().delete(table, {"user_id": f"eq.{user_id}"}, auth=auth)
+    except SupabaseError:
+        membership_cache.delete(membership_key(table, user_id))
+        raise
+    _record_write(table, user_id, lambda cached: [])
+
+
+async def bulk_add(table: str, user_id: str, property_ids: List[str], auth: Optional[str] = None) -> dict:
+    ids = unique_ids(property_ids)
+    try:
+        added = {row["property_id"] for row in await add_saved(table, user_id, ids, auth)}
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return {
+        "ok": True,
+        "added": [pid for pid in ids if pid in added],
+        "already_saved": [pid for pid in ids if pid not in added]
+    }
+
+
+async def bulk_remove(table: str, user_id: str, property_ids: List[str], auth: Optional[str] = None) -> dict:
+    ids = unique_ids(property_ids)
+    try:
+        removed = set(await remove_saved(table, user_id, ids, auth))
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return {
+        "ok": True,
+        "removed": [pid for pid in ids if pid in removed],
+        "not_found": [pid for pid in ids if pid not in removed]
+    }
+
+
+async def bulk_move(source: str, target: str, user_id: str, property_ids: List[str], auth: Optional[str] = None) -> dict:
+    """Move listings from one list to the other: one delete from source, then one upsert into target.
+
+    Only listings that were in the source list are moved. If the target
+    write fails they are put back, so a listing is never dropped from both.
+    """
+    ids = unique_ids(property_ids)
+    try:
+        removed = await remove_saved(source, user_id, ids, auth)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    if removed:
+        try:
+            await add_saved(target, user_id, removed, auth)
+        except SupabaseError as e:
+            try:
+                await add_saved(source, user_id, removed, auth)
+            except SupabaseError as restore_error:
+                print(f"Warning: Failed to restore {source} rows after a failed move: {restore_error.message}")
+            raise HTTPException(status_code=e.status_code, detail=e.message)
+    moved = set(removed)
+    return {
+        "ok": True,
+        "moved": [pid for pid in ids if pid in moved],
+        "not_found": [pid for pid in ids if pid not in moved]
+    }
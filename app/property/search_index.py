@@ -0,0 +1,419 @@
+import asyncio
+import itertools
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .clients import select_preferred_largest
+from .geo import BBox, GeoGrid
+from . import replica
+
+# Sort options accepted by the properties endpoint, mapped to (column, descending)
+SORT_OPTIONS: Dict[str, Tuple[str, bool]] = {
+    "price": ("price", False),
+    "-price": ("price", True),
+    "beds": ("beds", False),
+    "-beds": ("beds", True),
+    "sqft": ("sqft", False),
+    "-sqft": ("sqft", True),
+    "newest": ("modified", True)
+}
+
+# Open-ended last bucket for the bedroom and bathroom facets ("5+", "4+")
+BEDROOM_FACET_MAX = 5
+BATHROOM_FACET_MAX = 4
+
+_generations = itertools.count(1)
+
+def _numeric_column(records: List[dict], field: str) -> np.ndarray:
+    column = np.full(len(records), np.nan)
+    for i, record in enumerate(records):
+        value = record.get(field)
+        if value is None or value == "":
+            continue
+        try:
+            column[i] = float(value)
+        except (ValueError, TypeError):
+            pass
+    return column
+
+def _timestamp_column(records: List[dict], field: str) -> np.ndarray:
+    column = np.full(len(records), np.nan)
+    for i, record in enumerate(records):
+        value = record.get(field)
+        if not value:
+            continue
+        try:
+            column[i] = datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return column
+
+def _inverted_index(records: List[dict], field: str) -> Dict[str, np.ndarray]:
+    postings: Dict[str, List[int]] = {}
+    for i, record in enumerate(records):
+        value = record.get(field)
+        if value:
+            postings.setdefault(str(value).lower(), []).append(i)
+    return {value: np.array(rows, dtype=np.int64) for value, rows in postings.items()}
+
+def _category_codes(records: List[dict], field: str) -> Tuple[np.ndarray, List[str]]:
+    """Integer code per row (-1 when missing) and the label of each code"""
+    codes = np.full(len(records), -1, dtype=np.int64)
+    lookup: Dict[str, int] = {}
+    labels: List[str] = []
+    for i, record in enumerate(records):
+        value = record.get(field)
+        if not value:
+            continue
+        normalized = str(value).lower()
+        if normalized not in lookup:
+            lookup[normalized] = len(labels)
+            labels.append(str(value))
+        codes[i] = lookup[normalized]
+    return codes, labels
+
+def _category_counts(codes: np.ndarray, labels: List[str], mask: np.ndarray) -> List[dict]:
+    counts = np.bincount(codes[mask & (codes >= 0)], minlength=len(labels))
+    present = np.flatnonzero(counts)
+    # Most common first, alphabetical among ties
+    ranked = sorted(present, key=lambda code: (-counts[code], labels[code]))
+    return [{"value": labels[code], "count": int(counts[code])} for code in ranked]
+
+def _bucket_counts(column: np.ndarray, mask: np.ndarray, top: int) -> List[dict]:
+    values = column[mask]
+    values = values[~np.isnan(values)]
+    counts = np.bincount(np.clip(values, 0, top).astype(np.int64), minlength=top + 1)
+    return [
+        {"value": f"{bucket}+" if bucket == top else str(bucket), "count": int(counts[bucket])}
+        for bucket in range(top + 1)
+    ]
+
+
+class ListingIndex:
+    """Immutable in-memory columnar index over the replicated listings.
+
+    Numeric fields are NumPy columns with a sorted permutation each, so a
+    range predicate is two binary searches. City, CityRegion and property
+    type have inverted indexes. Predicates are combined as boolean masks.
+    """
+
+    NUMERIC_FIELDS = {
+        "price": "ListPrice",
+        "beds": "BedroomsTotal",
+        "baths": "BathroomsTotalInteger",
+        "sqft": "LivingArea",
+        "parking": "ParkingTotal"
+    }
+
+    def __init__(self, records: List[dict], media_by_key: Optional[Dict[str, List[dict]]] = None):
+        media_by_key = media_by_key or {}
+        self.records = records
+        self.size = len(records)
+        self.generation = next(_generations)
+        self.keys = np.array([record.get("ListingKey", "") for record in records], dtype=str)
+        self.images = [select_preferred_largest(media_by_key.get(record.get("ListingKey"), [])) for record in records]
+
+        self.columns: Dict[str, np.ndarray] = {
+            name: _numeric_column(records, field) for name, field in self.NUMERIC_FIELDS.items()
+        }
+        self.columns["modified"] = _timestamp_column(records, "ModificationTimestamp")
+        self.geo = GeoGrid(_numeric_column(records, "Latitude"), _numeric_column(records, "Longitude"))
+
+        # Ascending and descending permutations per column. Ties keep
+        # ListingKey order (records are sorted by key) and missing values
+        # always sort last, so an (value, key) pair pins a unique position.
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._descending: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._present: Dict[str, int] = {}
+        for name, column in self.columns.items():
+            order = np.argsort(column, kind="stable")
+            self._sorted[name] = (order, column[order])
+            order = np.argsort(-column, kind="stable")
+            self._descending[name] = (order, -column[order])
+            self._present[name] = int(np.count_nonzero(~np.isnan(column)))
+
+        self.city_index = _inverted_index(records, "City")
+        self.region_index = _inverted_index(records, "CityRegion")
+        self.type_index = _inverted_index(records, "PropertySubType")
+        self.city_codes, self.city_labels = _category_codes(records, "City")
+        self.type_codes, self.type_labels = _category_codes(records, "PropertySubType")
+
+    def _slice(self, name: str, descending: bool, low: Optional[float], high: Optional[float]) -> Tuple[np.ndarray, int, int]:
+        """Permutation and [start, end) span holding values within [low, high].
+
+        Unbounded spans run to the end of the permutation, missing values included.
+        """
+        if descending:
+            order, negated = self._descending[name]
+            start = 0 if high is None else int(np.searchsorted(negated, -high, side="left"))
+            end = self.size if low is None else int(np.searchsorted(negated, -low, side="right"))
+        else:
+            order, values = self._sorted[name]
+            start = 0 if low is None else int(np.searchsorted(values, low, side="left"))
+            end = self.size if high is None else int(np.searchsorted(values, high, side="right"))
+        return order, start, end
+
+    def _range_mask(self, name: str, low: Optional[float], high: Optional[float]) -> Optional[np.ndarray]:
+        if low is None and high is None:
+            return None
+        order, start, end = self._slice(name, False, low, high)
+        end = min(end, self._present[name])
+        if (end - start) * 8 > self.size:
+            # Wide ranges: a straight vectorized compare beats scattering row ids
+            column = self.columns[name]
+            mask = ~np.isnan(column)
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+            return mask
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def _postings_mask(self, postings: Dict[str, np.ndarray], value: Optional[str], contains: bool = False) -> Optional[np.ndarray]:
+        if not value:
+            return None
+        needle = value.lower()
+        mask = np.zeros(self.size, dtype=bool)
+        if contains:
+            for name, rows in postings.items():
+                if needle in name:
+                    mask[rows] = True
+        elif needle in postings:
+            mask[postings[needle]] = True
+        return mask
+
+    def predicate_masks(
+        self,
+        city: Optional[str] = None,
+        city_region: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_beds: Optional[int] = None,
+        max_beds: Optional[int] = None,
+        min_baths: Optional[int] = None,
+        max_baths: Optional[int] = None,
+        property_type: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """Boolean row mask per active predicate, keyed by facet name"""
+        masks = {
+            "city": self._postings_mask(self.city_index, city, contains=True),
+            "city_region": self._postings_mask(self.region_index, city_region),
+            "property_type": self._postings_mask(self.type_index, property_type),
+            "price": self._range_mask("price", min_price, max_price),
+            "beds": self._range_mask("beds", min_beds, max_beds),
+            "baths": self._range_mask("baths", min_baths, max_baths)
+        }
+        return {name: mask for name, mask in masks.items() if mask is not None}
+
+    def _combine(self, masks: Dict[str, np.ndarray], skip: Optional[str] = None) -> np.ndarray:
+        mask = np.ones(self.size, dtype=bool)
+        for name, predicate in masks.items():
+            if name != skip:
+                mask &= predicate
+        return mask
+
+    def filter(self, **predicates) -> np.ndarray:
+        """Return the boolean row mask for the given predicates"""
+        return self._combine(self.predicate_masks(**predicates))
+
+    def facets(self, price_bins: int = 20, **predicates) -> dict:
+        """Facet counts and a price histogram for the rows matching the predicates.
+
+        Each facet ignores its own predicate, so the sidebar still lists the
+        alternatives to what is currently selected.
+        """
+        masks = self.predicate_masks(**predicates)
+        prices = self.columns["price"]
+        price_values = prices[self._combine(masks, "price") & ~np.isnan(prices)]
+        histogram = []
+        low = high = None
+        if len(price_values):
+            low, high = float(price_values.min()), float(price_values.max())
+            counts, edges = np.histogram(price_values, bins=price_bins, range=(low, high if high > low else low + 1))
+            histogram = [
+                {"min": float(edges[i]), "max": float(edges[i + 1]), "count": int(count)}
+                for i, count in enumerate(counts)
+            ]
+        return {
+            "total": int(np.count_nonzero(self._combine(masks))),
+            "cities": _category_counts(self.city_codes, self.city_labels, self._combine(masks, "city")),
+            "propertyTypes": _category_counts(self.type_codes, self.type_labels, self._combine(masks, "property_type")),
+            "bedrooms": _bucket_counts(self.columns["beds"], self._combine(masks, "beds"), BEDROOM_FACET_MAX),
+            "bathrooms": _bucket_counts(self.columns["baths"], self._combine(masks, "baths"), BATHROOM_FACET_MAX),
+            "price": {"min": low, "max": high, "histogram": histogram}
+        }
+
+    def order(self, mask: np.ndarray, sort_by: Optional[str] = None) -> np.ndarray:
+        """Row ids selected by mask, ordered by sort_by (ListingKey order by default)"""
+        if sort_by in SORT_OPTIONS:
+            name, descending = SORT_OPTIONS[sort_by]
+            order = (self._descending if descending else self._sorted)[name][0]
+            return order[mask[order]]
+        return np.flatnonzero(mask)
+
+    def _after_mask(self, sort_by: Optional[str], after: Tuple[Optional[float], str]) -> np.ndarray:
+        """Rows strictly after the (sort value, ListingKey) keyset position"""
+        value, key = after
+        later_key = self.keys > key
+        if sort_by not in SORT_OPTIONS:
+            return later_key
+        name, descending = SORT_OPTIONS[sort_by]
+        column = self.columns[name]
+        missing = np.isnan(column)
+        if value is None:
+            return missing & later_key
+        beyond = column < value if descending else column > value
+        return beyond | ((column == value) & later_key) | missing
+
+    def cursor_for(self, row: int, sort_by: Optional[str] = None) -> Tuple[Optional[float], str]:
+        """Keyset position of a row, to resume a page after it"""
+        value = None
+        if sort_by in SORT_OPTIONS:
+            value = float(self.columns[SORT_OPTIONS[sort_by][0]][row])
+            if np.isnan(value):
+                value = None
+        return value, str(self.keys[row])
+
+    def top(
+        self,
+        mask: np.ndarray,
+        sort_by: Optional[str],
+        limit: int,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+        after: Optional[Tuple[Optional[float], str]] = None
+    ) -> np.ndarray:
+        """First limit row ids in sort order.
+
+        Only the part of the permutation inside [low, high] on the sort column
+        (narrowed further by an ``after`` cursor) is scanned, in growing
+        windows, so a page costs about limit rows.
+        """
+        if after is not None:
+            mask = mask & self._after_mask(sort_by, after)
+        if sort_by not in SORT_OPTIONS:
+            return np.flatnonzero(mask)[:limit]
+        name, descending = SORT_OPTIONS[sort_by]
+        if after is not None and after[0] is not None:
+            if descending:
+                high = after[0] if high is None else min(high, after[0])
+            else:
+                low = after[0] if low is None else max(low, after[0])
+        order, start, end = self._slice(name, descending, low, high)
+        if after is not None and after[0] is None:
+            start = self._present[name]
+        window = max(limit * 8, 256)
+        position = start
+        found = []
+        matched = 0
+        while position < end and matched < limit:
+            chunk = order[position:min(position + window, end)]
+            rows = chunk[mask[chunk]]
+            found.append(rows)
+            matched += len(rows)
+            position += window
+            window *= 4
+        return np.concatenate(found)[:limit] if found else np.empty(0, dtype=np.int64)
+
+    def search_rows(
+        self,
+        limit: int = 24,
+        sort_by: Optional[str] = None,
+        after: Optional[Tuple[Optional[float], str]] = None,
+        **predicates
+    ) -> np.ndarray:
+        """Row ids of the next page matching the predicates"""
+        mask = self.filter(**predicates)
+        low = high = None
+        if sort_by in SORT_OPTIONS:
+            name = SORT_OPTIONS[sort_by][0]
+            low, high = predicates.get(f"min_{name}"), predicates.get(f"max_{name}")
+        return self.top(mask, sort_by, limit, low, high, after)
+
+    def search_bbox(self, bbox: BBox, limit: int, **predicates) -> np.ndarray:
+        """Row ids inside a bounding box matching the predicates, in ListingKey order"""
+        rows = np.sort(self.geo.within_bbox(bbox))
+        return rows[self.filter(**predicates)[rows]][:limit]
+
+    def search_radius(self, lat: float, lng: float, radius_km: float, limit: int, **predicates) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids within radius_km matching the predicates, nearest first, with distances"""
+        rows, distances = self.geo.within_radius(lat, lng, radius_km)
+        keep = self.filter(**predicates)[rows]
+        return rows[keep][:limit], distances[keep][:limit]
+
+    def search_nearest(self, lat: float, lng: float, count: int, **predicates) -> Tuple[np.ndarray, np.ndarray]:
+        """The count nearest rows matching the predicates, with distances"""
+        return self.geo.nearest(lat, lng, count, self.filter(**predicates))
+
+    def search(self, limit: int = 24, sort_by: Optional[str] = None, **predicates) -> List[Tuple[dict, List[str]]]:
+        """Return up to limit (record, image URLs) pairs matching the predicates"""
+        rows = self.search_rows(limit, sort_by, **predicates)
+        return [(self.records[i], self.images[i]) for i in rows]
+
+
+_listing_index: Optional[ListingIndex] = None
+_built_run: Optional[int] = None
+_refresh_lock = asyncio.Lock()
+_poller: Optional[asyncio.Task] = None
+
+def get_listing_index() -> Optional[ListingIndex]:
+    """Return the current listing index, or None until the replica is loaded"""
+    return _listing_index
+
+def build_listing_index(store: "replica.ListingStore") -> ListingIndex:
+    records = sorted(store.iter_properties(), key=lambda record: record.get("ListingKey", ""))
+    media_by_key = store.media_for(record["ListingKey"] for record in records)
+    return ListingIndex(records, media_by_key)
+
+async def refresh_listing_index():
+    """Rebuild the index off the event loop and swap it in, if a sync finished since the last build"""
+    global _listing_index, _built_run
+    store = replica.get_replica()
+    if store is None:
+        return
+    async with _refresh_lock:
+        run = await asyncio.to_thread(store.last_sync_run)
+        if _listing_index is not None and run == _built_run:
+            return
+        _listing_index = await asyncio.to_thread(build_listing_index, store)
+        _built_run = run
+    print(f"Listing index rebuilt with {_listing_index.size} listings")
+
+async def _poll_replica():
+    """Build the index, then keep it in step with syncs run by any worker.
+
+    Only the worker holding the sync lease gets listener calls, so the
+    others watch the replica's sync run counter instead.
+    """
+    while True:
+        try:
+            await refresh_listing_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error refreshing listing index: {e}")
+        await asyncio.sleep(replica.MLS_REPLICA_POLL_INTERVAL)
+
+async def start_search_index():
+    """Build the index from the replica in the background and rebuild it after every sync"""
+    global _poller
+    if replica.sync_worker is None:
+        return
+    replica.sync_worker.listeners.append(refresh_listing_index)
+    _poller = asyncio.create_task(_poll_replica())
+
+async def stop_search_index():
+    global _listing_index, _built_run, _poller
+    if _poller is not None:
+        _poller.cancel()
+        try:
+            await _poller
+        except asyncio.CancelledError:
+            pass
+        _poller = None
+    _listing_index = None
+    _built_run = None
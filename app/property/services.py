@@ -1,5 +1,43 @@
+import gc
+import os
+from contextlib import contextmanager
+import numpy as np
+from pydantic import TypeAdapter, ValidationError
 from .models import Property, Address, Coordinates
-from typing import List
+from typing import Any, List, Sequence
+from core.cache import TTLCache
+from core.serialization import dumps
+
+# MLS PropertyType -> frontend property type
+PROPERTY_TYPE_MAP = {
+    "Residential": "house",
+    "Condo": "apartment", 
+    "Commercial": "commercial",
+    "Land": "land",
+    "Farm": "farm"
+}
+
+# MLS MlsStatus -> frontend status
+STATUS_MAP = {
+    "Active": "available",
+    "Pending": "pending",
+    "Sold": "sold",
+    "Expired": "expired"
+}
+
+property_list_adapter = TypeAdapter(List[Property])
+
+# Pre-serialized Property JSON per listing version
+PROPERTY_JSON_CACHE_ENABLED = os.getenv("PROPERTY_JSON_CACHE_ENABLED", "true").lower() == "true"
+PROPERTY_JSON_CACHE_TTL = float(os.getenv("PROPERTY_JSON_CACHE_TTL", 600))
+PROPERTY_JSON_CACHE_MAX_ENTRIES = int(os.getenv("PROPERTY_JSON_CACHE_MAX_ENTRIES", 20000))
+
+# Keyed by ListingKey, ModificationTimestamp and images, so an edited listing gets a new entry
+property_json_cache = TTLCache(
+    max_entries=PROPERTY_JSON_CACHE_MAX_ENTRIES,
+    ttl=PROPERTY_JSON_CACHE_TTL,
+    name="property_json_cache"
+)
 
 def transform_property(mls_property: dict, media_urls: List[str]) -> Property:
     """Transform MLS property data to frontend schema"""
@@ -37,26 +75,17 @@ def transform_property(mls_property: dict, media_urls: List[str]) -> Property:
         except (ValueError, TypeError):
             square_feet = 0
         
-        # Property type mapping
-        property_type_map = {
-            "Residential": "house",
-            "Condo": "apartment", 
-            "Commercial": "commercial",
-            "Land": "land",
-            "Farm": "farm"
-        }
-        mls_property_type = mls_property.get("PropertyType", "Residential")
-        property_type = property_type_map.get(mls_property_type, "house")
+        try:
+            latitude = float(mls_property.get("Latitude") or 0.0)
+            longitude = float(mls_property.get("Longitude") or 0.0)
+        except (ValueError, TypeError):
+            latitude, longitude = 0.0, 0.0
         
-        # Status mapping
-        status_map = {
-            "Active": "available",
-            "Pending": "pending",
-            "Sold": "sold",
-            "Expired": "expired"
-        }
+        # Property type and status mapping
+        mls_property_type = mls_property.get("PropertyType", "Residential")
+        property_type = PROPERTY_TYPE_MAP.get(mls_property_type, "house")
         mls_status = mls_property.get("MlsStatus", "Active")
-        status = status_map.get(mls_status, "available")
+        status = STATUS_MAP.get(mls_status, "available")
         
         # Amenities (extract from features if available)
         amenities = []
@@ -78,7 +107,7 @@ def transform_property(mls_property: dict, media_urls: List[str]) -> Property:
                 state=state,
                 zipCode=zip_code,
                 country=country,
-                coordinates=Coordinates(lat=0.0, lng=0.0)
+                coordinates=Coordinates(lat=latitude, lng=longitude)
             ),
             price=price,
             bedrooms=bedrooms,
@@ -116,4 +145,163 @@ def transform_property(mls_property: dict, media_urls: List[str]) -> Property:
             amenities=[],
             createdAt="2024-01-01",
             updatedAt="2024-01-01T00:00:00.000Z"
-        ) 
\ No newline at end of file
+        )
+
+def _float_column(values: Sequence[Any]) -> np.ndarray:
+    """Parse a column of MLS values as floats; missing or malformed values become 0"""
+    try:
+        column = np.array(values, dtype=float)
+    except (ValueError, TypeError):
+        column = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (ValueError, TypeError):
+                column[i] = np.nan
+    column[~np.isfinite(column)] = 0.0
+    return column
+
+def _int_column(values: Sequence[Any]) -> List[int]:
+    return _float_column(values).astype(np.int64).tolist()
+
+def _truncate(text: str, length: int) -> str:
+    return text[:length] + "..." if len(text) > length else text
+
+@contextmanager
+def _gc_paused():
+    """Pause the cyclic GC while a batch allocates many short-lived, acyclic objects"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def property_rows(mls_properties: Sequence[dict], media_urls: Sequence[List[str]]) -> List[dict]:
+    """Normalize a batch of MLS records into plain dicts shaped like Property.
+    
+    Numeric fields are parsed column-wise with NumPy and the type/status
+    mappings are plain lookups, so no per-row exception handling is needed.
+    """
+    prices = _float_column([prop.get("ListPrice") for prop in mls_properties]).tolist()
+    bedrooms = _int_column([prop.get("BedroomsTotal") for prop in mls_properties])
+    bathrooms = _int_column([prop.get("BathroomsTotalInteger") for prop in mls_properties])
+    square_feet = _int_column([prop.get("LivingArea") for prop in mls_properties])
+    latitudes = _float_column([prop.get("Latitude") for prop in mls_properties]).tolist()
+    longitudes = _float_column([prop.get("Longitude") for prop in mls_properties]).tolist()
+    
+    rows = []
+    for i, prop in enumerate(mls_properties):
+        remarks = prop.get("PublicRemarks", "")
+        title = remarks or prop.get("ListingTitle", "") or "No title available"
+        features = prop.get("Features", "")
+        rows.append({
+            "id": prop.get("ListingKey", ""),
+            "title": _truncate(title, 200),
+            "description": _truncate(remarks or "No description available", 500),
+            "address": {
+                "street": prop.get("PropertyAddress", "") or "",
+                "city": prop.get("City", "") or "Unknown",
+                "state": prop.get("StateOrProvince", "") or "Unknown",
+                "zipCode": prop.get("PostalCode", "") or "Unknown",
+                "country": prop.get("Country", "") or "CA",
+                "coordinates": {"lat": latitudes[i], "lng": longitudes[i]}
+            },
+            "price": prices[i],
+            "bedrooms": bedrooms[i],
+            "bathrooms": bathrooms[i],
+            "squareFeet": square_feet[i],
+            "propertyType": PROPERTY_TYPE_MAP.get(prop.get("PropertyType", "Residential"), "house"),
+            "status": STATUS_MAP.get(prop.get("MlsStatus", "Active"), "available"),
+            "images": media_urls[i],
+            "amenities": [feature.strip() for feature in features.split(",") if feature.strip()] if features else [],
+            "createdAt": prop.get("ListingContractDate", "") or "2024-01-01",
+            "updatedAt": prop.get("ModificationTimestamp", "") or "2024-01-01T00:00:00.000Z"
+        })
+    return rows
+
+def transform_properties(mls_properties: Sequence[dict], media_urls: Sequence[List[str]]) -> List[Property]:
+    """Transform a batch of MLS properties, validating all rows in one pass"""
+    try:
+        with _gc_paused():
+            return property_list_adapter.validate_python(property_rows(mls_properties, media_urls))
+    except (ValidationError, AttributeError, TypeError) as e:
+        # Malformed record somewhere in the batch: fall back to the per-row path
+        print(f"Warning: batch transform failed, transforming row by row: {e}")
+        return [transform_property(prop, urls) for prop, urls in zip(mls_properties, media_urls)]
+
+def transform_properties_json(mls_properties: Sequence[dict], media_urls: Sequence[List[str]]) -> bytes:
+    """Transform a batch of MLS properties to a pre-serialized JSON array"""
+    properties = transform_properties(mls_properties, media_urls)
+    with _gc_paused():
+        return property_list_adapter.dump_json(properties)
+
+def property_json_key(mls_property: dict, media_urls: List[str]) -> str:
+    return f"{mls_property.get('ListingKey', '')}:{mls_property.get('ModificationTimestamp', '')}:{hash(tuple(media_urls))}"
+
+def serialize_properties(mls_properties: Sequence[dict], media_urls: Sequence[List[str]]) -> List[bytes]:
+    """Transform a batch of MLS properties to one JSON object (bytes) per Property.
+    
+    The rows are built and validated once as a batch and then serialized
+    directly, so no Property models need to be dumped again. A malformed
+    batch, whether it fails building or validation, falls back to the
+    per-row transform.
+    """
+    try:
+        rows = property_rows(mls_properties, media_urls)
+        with _gc_paused():
+            property_list_adapter.validate_python(rows)
+    except (ValidationError, AttributeError, TypeError) as e:
+        print(f"Warning: batch transform failed, transforming row by row: {e}")
+        rows = [transform_property(prop, urls).model_dump() for prop, urls in zip(mls_properties, media_urls)]
+    with _gc_paused():
+        return [dumps(row) for row in rows]
+
+def transform_properties_json_parts(mls_properties: Sequence[dict], media_urls: Sequence[List[str]]) -> List[bytes]:
+    """Serialized Property JSON for each listing, reusing cached bytes for unchanged listings"""
+    if not PROPERTY_JSON_CACHE_ENABLED:
+        return serialize_properties(mls_properties, media_urls)
+    keys = [property_json_key(prop, urls) for prop, urls in zip(mls_properties, media_urls)]
+    parts = [property_json_cache.get(key) for key in keys]
+    missing = [i for i, part in enumerate(parts) if part is None]
+    if missing:
+        fresh = serialize_properties([mls_properties[i] for i in missing], [media_urls[i] for i in missing])
+        for i, part in zip(missing, fresh):
+            property_json_cache.set(keys[i], part)
+            parts[i] = part
+    return parts
+
+def transform_property_detail(mls_property: dict, images: List[str], property_id: str = "") -> dict:
+    """Transform MLS property data to the property detail payload"""
+    # Build formatted address
+    address_parts = [
+        mls_property.get("PropertyAddress", ""),
+        mls_property.get("City", ""),
+        mls_property.get("StateOrProvince", ""),
+        mls_property.get("PostalCode", ""),
+        mls_property.get("Country", "") or "CA"
+    ]
+    address_str = ", ".join(filter(None, address_parts))
+    
+    return {
+        "id": mls_property.get("ListingKey", property_id),
+        "images": images,
+        "price": mls_property.get("ListPrice", ""),
+        "address": address_str,
+        "added": mls_property.get("ListingContractDate", ""),
+        "beds": int(mls_property.get("BedroomsTotal", 0) or 0),
+        "baths": int(mls_property.get("BathroomsTotalInteger", 0) or 0),
+        "parking": int(mls_property.get("ParkingTotal", 0) or 0),
+        "sqft": mls_property.get("LivingArea", ""),
+        "location": mls_property.get("City", ""),
+        "coordinates": {
+            "lat": float(mls_property.get("Latitude") or 0.0),
+            "lng": float(mls_property.get("Longitude") or 0.0)
+        },
+        "areaCode": mls_property.get("Area", ""),
+        "propertyType": mls_property.get("PropertyType", ""),
+        "availableDate": mls_property.get("AvailableDate", ""),
+        "leaseTerms": mls_property.get("LeaseTerm", ""),
+        "description": mls_property.get("PublicRemarks", "") or mls_property.get("PrivateRemarks", "") or ""
+    }
@@ -1,89 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from app.auth.deps import get_current_user
-import httpx
-import os
-import asyncio
-from app.property.api import get_property_by_id
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from app.auth.deps import get_current_user_supabase
+from app.property.models import PropertyIds
+from app.property.saved import (
+    CART_TABLE,
+    WISHLIST_TABLE,
+    add_saved,
+    bulk_add,
+    bulk_move,
+    bulk_remove,
+    clear_saved,
+    remove_saved,
+    saved_cards,
+    saved_etag,
+    saved_rows
+)
+from core.database import SupabaseError
+from core.etag import etag_matches
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
+router = APIRouter(prefix="/wishlist", tags=["wishlist"])
 
-if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    raise RuntimeError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables or .env file.")
+# Add several properties to wishlist in one request
+@router.post("/bulk", status_code=200)
+async def bulk_add_to_wishlist(body: PropertyIds, user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    return await bulk_add(WISHLIST_TABLE, user["sub"], body.property_ids, auth=auth_header)
 
-router = APIRouter(prefix="/wishlist", tags=["wishlist"])
+# Remove several properties from wishlist in one request
+@router.post("/bulk/remove", status_code=200)
+async def bulk_remove_from_wishlist(body: PropertyIds, user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    return await bulk_remove(WISHLIST_TABLE, user["sub"], body.property_ids, auth=auth_header)
 
-# Helper to get Supabase REST endpoint
-WISHLIST_ENDPOINT = f"{SUPABASE_URL}/rest/v1/wishlist"
+# Move properties from wishlist to cart
+@router.post("/move-to-cart", status_code=200)
+async def move_to_cart(body: PropertyIds, user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    return await bulk_move(WISHLIST_TABLE, CART_TABLE, user["sub"], body.property_ids, auth=auth_header)
 
 # Add property to wishlist
 @router.post("/{property_id}", status_code=201)
-async def add_to_wishlist(property_id: str, user=Depends(get_current_user), request: Request = None):
+async def add_to_wishlist(property_id: str, user=Depends(get_current_user_supabase), request: Request = None):
     user_id = user["sub"]
-    headers = {
-        "Content-Type": "application/json",
-        "Prefer": "return=representation"
-    }
-    if SUPABASE_ANON_KEY:
-        headers["apikey"] = SUPABASE_ANON_KEY
+    # Run as the caller so row-level security applies
     auth_header = request.headers.get("Authorization") if request else None
-    if auth_header:
-        headers["Authorization"] = auth_header
-    payload = {"user_id": user_id, "property_id": property_id}
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(WISHLIST_ENDPOINT, json=payload, headers=headers)
-        if resp.status_code not in (201, 200):
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return {"ok": True}
+    try:
+        await add_saved(WISHLIST_TABLE, user_id, [property_id], auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return {"ok": True}
 
 # Remove property from wishlist
 @router.delete("/{property_id}", status_code=204)
-async def remove_from_wishlist(property_id: str, user=Depends(get_current_user), request: Request = None):
+async def remove_from_wishlist(property_id: str, user=Depends(get_current_user_supabase), request: Request = None):
     user_id = user["sub"]
-    headers = {}
-    if SUPABASE_ANON_KEY:
-        headers["apikey"] = SUPABASE_ANON_KEY
     auth_header = request.headers.get("Authorization") if request else None
-    if auth_header:
-        headers["Authorization"] = auth_header
-    # Use query params to delete
-    url = f"{WISHLIST_ENDPOINT}?user_id=eq.{user_id}&property_id=eq.{property_id}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.delete(url, headers=headers)
-        if resp.status_code not in (204, 200):
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        return {"ok": True}
+    try:
+        await remove_saved(WISHLIST_TABLE, user_id, [property_id], auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return {"ok": True}
+
+# Remove every property from wishlist
+@router.delete("/", status_code=204)
+async def clear_wishlist(user=Depends(get_current_user_supabase), request: Request = None):
+    auth_header = request.headers.get("Authorization") if request else None
+    try:
+        await clear_saved(WISHLIST_TABLE, user["sub"], auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return Response(status_code=204)
 
 # List all wishlist properties for user
 @router.get("/", status_code=200)
-async def list_wishlist(user=Depends(get_current_user), request: Request = None):
+async def list_wishlist(response: Response, user=Depends(get_current_user_supabase), request: Request = None):
     user_id = user["sub"]
-    headers = {}
-    if SUPABASE_ANON_KEY:
-        headers["apikey"] = SUPABASE_ANON_KEY
     auth_header = request.headers.get("Authorization") if request else None
-    if auth_header:
-        headers["Authorization"] = auth_header
-    url = f"{WISHLIST_ENDPOINT}?user_id=eq.{user_id}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, headers=headers)
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        wishlist = resp.json()
-
-    # For best performance, batch property_id lookups if possible
-    # If not, parallelize using asyncio.gather
-    property_ids = [entry["property_id"] for entry in wishlist]
-    property_map = {}
-
-    # Try to batch if you have a batch endpoint, else parallelize
-    # We'll use the get_property_by_id logic in parallel
-    async def fetch_property(property_id):
-        # Reuse the get_property_by_id logic (no auth required for this call)
-        return await get_property_by_id(property_id)
+    try:
+        wishlist = await saved_rows(WISHLIST_TABLE, user_id, auth=auth_header)
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
 
-    property_objs = await asyncio.gather(*[fetch_property(pid) for pid in property_ids])
-    for entry, prop in zip(wishlist, property_objs):
-        entry["property"] = prop
+    # Cached cards, with the rest resolved by a few batched lookups
+    cards = await saved_cards([entry["property_id"] for entry in wishlist])
+    etag = saved_etag(WISHLIST_TABLE, user_id, wishlist, cards)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
 
-    return wishlist 
\ No newline at end of file
+    # Rows may be cached, so build new entries rather than annotating them
+    return [
+        {**entry, "property": cards[entry["property_id"]][0] if entry["property_id"] in cards else {"error": "Property not found"}}
+        for entry in wishlist
+    ]
@@ -1,49 +1,50 @@
-import os
-from supabase import create_client, Client
 from app.questions.models import Question, QuestionCreate, QuestionUpdate
+from core.cache import reference_cache
+from core.database import SupabaseRest, get_database
 from typing import List, Optional
 from uuid import UUID
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase URL or Key not set in environment variables")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 class QuestionService:
-    @staticmethod
-    def get_questions() -> List[Question]:
-        data, count, error = supabase.table("questions").select("*").execute()
-        if error:
-            raise Exception(error.message)
+    def __init__(self, db: Optional[SupabaseRest] = None):
+        self._db = db
+        # Small reference table: reads are served from memory, writes invalidate
+        self.cache = reference_cache("questions")
+
+    @property
+    def db(self) -> SupabaseRest:
+        return self._db or get_database()
+
+    async def _load_questions(self) -> List[Question]:
+        data = await self.db.select("questions")
         return [Question(**item) for item in data]
 
-    @staticmethod
-    def get_question(question_id: UUID) -> Optional[Question]:
-        data, count, error = supabase.table("questions").select("*").eq("id", str(question_id)).single().execute()
-        if error:
-            raise Exception(error.message)
+    async def _load_question(self, question_id: UUID) -> Question:
+        data = await self.db.select("questions", {"id": f"eq.{question_id}"}, single=True)
         return Question(**data)
 
-    @staticmethod
-    def create_question(question: QuestionCreate) -> Question:
-        data, count, error = supabase.table("questions").insert(question.dict()).execute()
-        if error:
-            raise Exception(error.message)
-        return Question(**data[0])
-
-    @staticmethod
-    def update_question(question_id: UUID, question: QuestionUpdate) -> Question:
-        data, count, error = supabase.table("questions").update(question.dict(exclude_unset=True)).eq("id", str(question_id)).execute()
-        if error:
-            raise Exception(error.message)
-        return Question(**data[0])
-
-    @staticmethod
-    def delete_question(question_id: UUID):
-        data, count, error = supabase.table("questions").delete().eq("id", str(question_id)).execute()
-        if error:
-            raise Exception(error.message)
+    async def get_questions(self) -> List[Question]:
+        return list(await self.cache.get_or_load("all", self._load_questions))
+
+    async def get_question(self, question_id: UUID) -> Optional[Question]:
+        return await self.cache.get_or_load(f"id:{question_id}", lambda: self._load_question(question_id))
+
+    async def create_question(self, question: QuestionCreate) -> Question:
+        data = await self.db.insert("questions", question.model_dump(mode="json"))
+        created = Question(**data[0])
+        self.cache.invalidate()
+        self.cache.set(f"id:{created.id}", created)
+        return created
+
+    async def update_question(self, question_id: UUID, question: QuestionUpdate) -> Question:
+        data = await self.db.update("questions", question.model_dump(mode="json", exclude_unset=True), {"id": f"eq.{question_id}"})
+        self.cache.invalidate()
+        updated = Question(**data[0])
+        self.cache.set(f"id:{question_id}", updated)
+        return updated
+
+    async def delete_question(self, question_id: UUID):
+        await self.db.delete("questions", {"id": f"eq.{question_id}"})
+        self.cache.invalidate()
         return True
 
 question_service = QuestionService() 
\ No newline at end of file
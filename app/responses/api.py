@@ -1,43 +1,158 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import os
+from fastapi import APIRouter, HTTPException, Query
+from fastapi import Response as HTTPResponse
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
+from pydantic import ValidationError
 from uuid import UUID
-from app.responses.models import Response, ResponseCreate, ResponseUpdate
+from app.responses.models import BulkResponseResult, BulkResponseResults, Response, ResponseCreate, ResponseUpdate
 from app.responses.services import response_service
+from core.database import SupabaseError
+from core.pagination import (
+    PAGE_DEFAULT_LIMIT,
+    PAGE_MAX_LIMIT,
+    keyset_after,
+    keyset_cursor,
+    ndjson_rows,
+    parse_fields,
+    prime_rows,
+    query_fingerprint
+)
 
 router = APIRouter(tags=["responses"])
 
-@router.get("/", response_model=List[Response])
-def list_responses():
+# Largest questionnaire accepted by the bulk endpoint
+RESPONSE_BULK_MAX_ITEMS = int(os.getenv("RESPONSE_BULK_MAX_ITEMS", 200))
+
+RESPONSE_FIELDS = list(Response.model_fields)
+
+def response_filters(user_id: Optional[UUID], question_id: Optional[UUID]) -> dict:
+    """PostgREST filters for the response list query parameters"""
+    filters = {}
+    if user_id:
+        filters["user_id"] = f"eq.{user_id}"
+    if question_id:
+        filters["question_id"] = f"eq.{question_id}"
+    return filters
+
+@router.get("/", response_model=None)
+async def list_responses(
+    http_response: HTTPResponse,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT, description="Responses per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    user_id: Optional[UUID] = Query(None, description="Only responses by this user"),
+    question_id: Optional[UUID] = Query(None, description="Only responses to this question"),
+    fields: Optional[str] = Query(None, description="Comma separated columns to return")
+):
+    """Page of responses ordered by id; X-Next-Cursor carries the next page's cursor"""
+    columns = parse_fields(fields, RESPONSE_FIELDS)
+    fingerprint = query_fingerprint(
+        user_id=str(user_id) if user_id else None,
+        question_id=str(question_id) if question_id else None,
+        fields=columns
+    )
+    after = keyset_after(cursor, fingerprint)
     try:
-        return response_service.get_responses()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        rows, next_after = await response_service.list_responses(
+            limit, after, response_filters(user_id, question_id), ",".join(columns) if columns else "*"
+        )
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    next_cursor = keyset_cursor(fingerprint, next_after)
+    if next_cursor:
+        http_response.headers["X-Next-Cursor"] = next_cursor
+    if columns:
+        return rows
+    return [Response(**row) for row in rows]
+
+@router.get("/export")
+async def export_responses(
+    user_id: Optional[UUID] = Query(None, description="Only responses by this user"),
+    question_id: Optional[UUID] = Query(None, description="Only responses to this question"),
+    fields: Optional[str] = Query(None, description="Comma separated columns to export")
+):
+    """Stream every matching response as NDJSON, one row per line"""
+    columns = parse_fields(fields, RESPONSE_FIELDS)
+    try:
+        rows = await prime_rows(response_service.iter_responses(
+            response_filters(user_id, question_id), ",".join(columns) if columns else "*"
+        ))
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return StreamingResponse(ndjson_rows(rows), media_type="application/x-ndjson")
 
 @router.get("/{response_id}", response_model=Response)
-def get_response(response_id: UUID):
+async def get_response(response_id: UUID):
     try:
-        return response_service.get_response(response_id)
+        return await response_service.get_response(response_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.post("/", response_model=Response)
-def create_response(response: ResponseCreate):
+async def create_response(response: ResponseCreate):
     try:
-        return response_service.create_response(response)
+        return await response_service.create_response(response)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/bulk", response_model=BulkResponseResults)
+async def upsert_responses(items: List[Dict[str, Any]]):
+    """Save a whole questionnaire in one database round-trip.
+    
+    Each item is validated on its own and upserted on (user_id, question_id).
+    Results are reported per item, in request order: invalid items are
+    skipped, and when the same pair appears twice the last one wins.
+    """
+    if len(items) > RESPONSE_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {RESPONSE_BULK_MAX_ITEMS} responses per request")
+
+    results: List[BulkResponseResult] = []
+    latest: Dict[tuple, int] = {}
+    valid: Dict[int, ResponseCreate] = {}
+    for index, item in enumerate(items):
+        try:
+            response = ResponseCreate.model_validate(item)
+        except ValidationError as e:
+            results.append(BulkResponseResult(index=index, status="invalid", errors=e.errors(include_url=False, include_context=False)))
+            continue
+        pair = (str(response.user_id), str(response.question_id))
+        if pair in latest:
+            results[latest[pair]].status = "superseded"
+        latest[pair] = index
+        valid[index] = response
+        results.append(BulkResponseResult(index=index, status="pending"))
+
+    to_save = {pair: valid[index] for pair, index in latest.items()}
+    try:
+        saved = await response_service.upsert_responses(list(to_save.values()))
+    except SupabaseError as e:
+        saved = []
+        for index in latest.values():
+            results[index].status = "failed"
+            results[index].errors = [e.message]
+    saved_by_pair = {(str(row.user_id), str(row.question_id)): row for row in saved}
+    for pair, index in latest.items():
+        if pair in saved_by_pair:
+            results[index].status = "saved"
+            results[index].response = saved_by_pair[pair]
+        elif results[index].status == "pending":
+            results[index].status = "failed"
+
+    saved_count = sum(1 for result in results if result.status == "saved")
+    failed_count = sum(1 for result in results if result.status in ("invalid", "failed"))
+    return BulkResponseResults(saved=saved_count, failed=failed_count, results=results)
+
 @router.put("/{response_id}", response_model=Response)
-def update_response(response_id: UUID, response: ResponseUpdate):
+async def update_response(response_id: UUID, response: ResponseUpdate):
     try:
-        return response_service.update_response(response_id, response)
+        return await response_service.update_response(response_id, response)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/{response_id}")
-def delete_response(response_id: UUID):
+async def delete_response(response_id: UUID):
     try:
-        response_service.delete_response(response_id)
+        await response_service.delete_response(response_id)
         return {"ok": True}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
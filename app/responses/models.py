@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Any
+from typing import Optional, Any, List
 from uuid import UUID
 from datetime import datetime
 
@@ -24,4 +24,15 @@ class Response(ResponseBase):
     updated_at: Optional[datetime]
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class BulkResponseResult(BaseModel):
+    index: int
+    status: str  # saved, invalid, superseded or failed
+    response: Optional[Response] = None
+    errors: Optional[List[Any]] = None
+
+class BulkResponseResults(BaseModel):
+    saved: int
+    failed: int
+    results: List[BulkResponseResult]
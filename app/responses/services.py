@@ -1,49 +1,59 @@
-import os
-from supabase import create_client, Client
 from app.responses.models import Response, ResponseCreate, ResponseUpdate
-from typing import List, Optional
+from core.database import SupabaseRest, get_database
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from uuid import UUID
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase URL or Key not set in environment variables")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# One response per user per question
+RESPONSE_CONFLICT_COLUMNS = "user_id,question_id"
 
 class ResponseService:
-    @staticmethod
-    def get_responses() -> List[Response]:
-        data, count, error = supabase.table("responses").select("*").execute()
-        if error:
-            raise Exception(error.message)
-        return [Response(**item) for item in data]
+    def __init__(self, db: Optional[SupabaseRest] = None):
+        self._db = db
+
+    @property
+    def db(self) -> SupabaseRest:
+        return self._db or get_database()
+
+    async def list_responses(
+        self,
+        limit: int,
+        after: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        columns: str = "*"
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of response rows ordered by id, and the id to continue after"""
+        return await self.db.select_page("responses", filters, columns, limit, after)
+
+    def iter_responses(self, filters: Optional[Dict[str, str]] = None, columns: str = "*") -> AsyncIterator[Dict[str, Any]]:
+        """Every matching response row, paged from the database as it is consumed"""
+        return self.db.iter_rows("responses", filters, columns)
 
-    @staticmethod
-    def get_response(response_id: UUID) -> Optional[Response]:
-        data, count, error = supabase.table("responses").select("*").eq("id", str(response_id)).single().execute()
-        if error:
-            raise Exception(error.message)
+    async def get_response(self, response_id: UUID) -> Optional[Response]:
+        data = await self.db.select("responses", {"id": f"eq.{response_id}"}, single=True)
         return Response(**data)
 
-    @staticmethod
-    def create_response(response: ResponseCreate) -> Response:
-        data, count, error = supabase.table("responses").insert(response.dict()).execute()
-        if error:
-            raise Exception(error.message)
+    async def create_response(self, response: ResponseCreate) -> Response:
+        data = await self.db.insert("responses", response.model_dump(mode="json"))
         return Response(**data[0])
 
-    @staticmethod
-    def update_response(response_id: UUID, response: ResponseUpdate) -> Response:
-        data, count, error = supabase.table("responses").update(response.dict(exclude_unset=True)).eq("id", str(response_id)).execute()
-        if error:
-            raise Exception(error.message)
+    async def upsert_responses(self, responses: List[ResponseCreate]) -> List[Response]:
+        """Create or replace responses in one request, keyed on (user_id, question_id).
+
+        Pairs must be unique within the batch; PostgREST rejects a batch
+        that touches the same row twice.
+        """
+        if not responses:
+            return []
+        rows = [response.model_dump(mode="json") for response in responses]
+        data = await self.db.upsert("responses", rows, on_conflict=RESPONSE_CONFLICT_COLUMNS)
+        return [Response(**item) for item in data]
+
+    async def update_response(self, response_id: UUID, response: ResponseUpdate) -> Response:
+        data = await self.db.update("responses", response.model_dump(mode="json", exclude_unset=True), {"id": f"eq.{response_id}"})
         return Response(**data[0])
 
-    @staticmethod
-    def delete_response(response_id: UUID):
-        data, count, error = supabase.table("responses").delete().eq("id", str(response_id)).execute()
-        if error:
-            raise Exception(error.message)
+    async def delete_response(self, response_id: UUID):
+        await self.db.delete("responses", {"id": f"eq.{response_id}"})
         return True
 
 response_service = ResponseService() 
\ No newline at end of file
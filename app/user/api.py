@@ -1,27 +1,67 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from uuid import UUID
 from app.user.models import User, UserCreate, UserUpdate, UserLogin, Token
 from app.user.services import user_service
 from app.auth.deps import get_current_user, create_access_token
 from datetime import timedelta
 from core.config import settings
+from core.security import PasswordPoolFull
+from core.database import SupabaseError
+from core.pagination import (
+    PAGE_DEFAULT_LIMIT,
+    PAGE_MAX_LIMIT,
+    keyset_after,
+    keyset_cursor,
+    ndjson_rows,
+    parse_fields,
+    prime_rows,
+    query_fingerprint
+)
 
 router = APIRouter(tags=["users"])
 
+# Columns a caller may project; exports leave out the password hash unless asked
+USER_FIELDS = list(User.model_fields)
+USER_EXPORT_FIELDS = [name for name in USER_FIELDS if name != "password_hash"]
+
+def user_filters(email: Optional[str], role: Optional[str]) -> dict:
+    """PostgREST filters for the user list query parameters"""
+    filters = {}
+    if email:
+        filters["email"] = f"eq.{email}"
+    if role:
+        filters["role"] = f"eq.{role}"
+    return filters
+
+def password_pool_unavailable() -> HTTPException:
+    """503 for when the password hashing pool is saturated"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent sign-ins, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
 @router.post("/signup", response_model=User)
 async def signup(user: UserCreate):
     """Create a new user account"""
     try:
         # Check if user already exists
-        existing_user = user_service.get_user_by_email(user.email)
+        existing_user = await user_service.get_user_by_email(user.email)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
         
-        return user_service.create_user(user)
+        return await user_service.create_user(user)
+    except HTTPException:
+        raise
+    except PasswordPoolFull:
+        raise password_pool_unavailable()
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -32,7 +72,7 @@ async def signup(user: UserCreate):
 async def login(user_credentials: UserLogin):
     """Authenticate user and return access token"""
     try:
-        user = user_service.authenticate_user(user_credentials.email, user_credentials.password)
+        user = await user_service.authenticate_user(user_credentials.email, user_credentials.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,6 +85,12 @@ async def login(user_credentials: UserLogin):
             data={"sub": user.email}, expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
+    except HTTPException:
+        raise
+    except PasswordPoolFull:
+        raise password_pool_unavailable()
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -55,35 +101,72 @@ async def login(user_credentials: UserLogin):
 async def get_current_user_info(current_user: str = Depends(get_current_user)):
     """Get current user information"""
     try:
-        user = user_service.get_user_by_email(current_user)
+        user = await user_service.get_user_by_email(current_user)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         return user
+    except HTTPException:
+        raise
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-@router.get("/", response_model=List[User])
-async def get_users():
-    """Get all users (admin only)"""
+@router.get("/", response_model=None)
+async def get_users(
+    response: Response,
+    limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT, description="Users per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    email: Optional[str] = Query(None, description="Exact email to match"),
+    role: Optional[str] = Query(None, description="Exact role to match"),
+    fields: Optional[str] = Query(None, description="Comma separated columns to return")
+):
+    """Get a page of users (admin only), ordered by id.
+    
+    The X-Next-Cursor response header carries the cursor for the next page.
+    With ``fields``, rows contain only those columns (plus id).
+    """
+    columns = parse_fields(fields, USER_FIELDS)
+    fingerprint = query_fingerprint(email=email, role=role, fields=columns)
+    after = keyset_after(cursor, fingerprint)
     try:
-        return user_service.get_users()
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
+        rows, next_after = await user_service.list_users(
+            limit, after, user_filters(email, role), ",".join(columns) if columns else "*"
         )
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    next_cursor = keyset_cursor(fingerprint, next_after)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if columns:
+        return rows
+    return [User(**row) for row in rows]
+
+@router.get("/export")
+async def export_users(
+    email: Optional[str] = Query(None, description="Exact email to match"),
+    role: Optional[str] = Query(None, description="Exact role to match"),
+    fields: Optional[str] = Query(None, description="Comma separated columns to export")
+):
+    """Stream every matching user as NDJSON (admin only), one row per line"""
+    columns = parse_fields(fields, USER_FIELDS) or USER_EXPORT_FIELDS
+    try:
+        rows = await prime_rows(user_service.iter_users(user_filters(email, role), ",".join(columns)))
+    except SupabaseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return StreamingResponse(ndjson_rows(rows), media_type="application/x-ndjson")
 
 @router.get("/{user_id}", response_model=User)
 async def get_user(user_id: UUID):
     """Get a specific user by ID"""
     try:
-        user = user_service.get_user(user_id)
+        user = await user_service.get_user(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -100,7 +183,7 @@ async def get_user(user_id: UUID):
 async def update_user(user_id: UUID, user: UserUpdate):
     """Update a user"""
     try:
-        return user_service.update_user(user_id, user)
+        return await user_service.update_user(user_id, user)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -111,7 +194,7 @@ async def update_user(user_id: UUID, user: UserUpdate):
 async def delete_user(user_id: UUID):
     """Delete a user"""
     try:
-        user_service.delete_user(user_id)
+        await user_service.delete_user(user_id)
         return {"message": "User deleted successfully"}
     except Exception as e:
         raise HTTPException(
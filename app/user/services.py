@@ -1,81 +1,69 @@
-import os
-from supabase import create_client, Client
 from app.user.models import User, UserCreate, UserUpdate
-from typing import List, Optional
+from core.database import SupabaseRest, get_database
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from uuid import UUID
-from passlib.context import CryptContext
+from core import security
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Supabase URL or Key not set in environment variables")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+class UserService:
+    def __init__(self, db: Optional[SupabaseRest] = None):
+        self._db = db
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    @property
+    def db(self) -> SupabaseRest:
+        return self._db or get_database()
 
-class UserService:
-    @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await security.verify_password(plain_password, hashed_password)
 
-    @staticmethod
-    def get_password_hash(password: str) -> str:
-        return pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await security.get_password_hash(password)
 
-    @staticmethod
-    def get_users() -> List[User]:
-        data, count, error = supabase.table("users").select("*").execute()
-        if error:
-            raise Exception(error.message)
-        return [User(**item) for item in data]
+    async def list_users(
+        self,
+        limit: int,
+        after: Optional[str] = None,
+        filters: Optional[Dict[str, str]] = None,
+        columns: str = "*"
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of user rows ordered by id, and the id to continue after"""
+        return await self.db.select_page("users", filters, columns, limit, after)
 
-    @staticmethod
-    def get_user(user_id: UUID) -> Optional[User]:
-        data, count, error = supabase.table("users").select("*").eq("id", str(user_id)).single().execute()
-        if error:
-            raise Exception(error.message)
-        return User(**data)
+    def iter_users(self, filters: Optional[Dict[str, str]] = None, columns: str = "*") -> AsyncIterator[Dict[str, Any]]:
+        """Every matching user row, paged from the database as it is consumed"""
+        return self.db.iter_rows("users", filters, columns)
 
-    @staticmethod
-    def get_user_by_email(email: str) -> Optional[User]:
-        data, count, error = supabase.table("users").select("*").eq("email", email).single().execute()
-        if error:
-            return None
+    async def get_user(self, user_id: UUID) -> Optional[User]:
+        data = await self.db.select("users", {"id": f"eq.{user_id}"}, single=True)
         return User(**data)
 
-    @staticmethod
-    def create_user(user: UserCreate) -> User:
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        """The user with this email, or None if there is none; database errors propagate"""
+        rows = await self.db.select("users", {"email": f"eq.{email}", "limit": "1"})
+        return User(**rows[0]) if rows else None
+
+    async def create_user(self, user: UserCreate) -> User:
         # Hash the password
-        hashed_password = UserService.get_password_hash(user.password)
-        user_data = user.dict()
+        hashed_password = await self.get_password_hash(user.password)
+        user_data = user.model_dump(mode="json")
         user_data.pop("password")
         user_data["password_hash"] = hashed_password
         
-        data, count, error = supabase.table("users").insert(user_data).execute()
-        if error:
-            raise Exception(error.message)
+        data = await self.db.insert("users", user_data)
         return User(**data[0])
 
-    @staticmethod
-    def update_user(user_id: UUID, user: UserUpdate) -> User:
-        data, count, error = supabase.table("users").update(user.dict(exclude_unset=True)).eq("id", str(user_id)).execute()
-        if error:
-            raise Exception(error.message)
+    async def update_user(self, user_id: UUID, user: UserUpdate) -> User:
+        data = await self.db.update("users", user.model_dump(mode="json", exclude_unset=True), {"id": f"eq.{user_id}"})
         return User(**data[0])
 
-    @staticmethod
-    def delete_user(user_id: UUID):
-        data, count, error = supabase.table("users").delete().eq("id", str(user_id)).execute()
-        if error:
-            raise Exception(error.message)
+    async def delete_user(self, user_id: UUID):
+        await self.db.delete("users", {"id": f"eq.{user_id}"})
         return True
 
-    @staticmethod
-    def authenticate_user(email: str, password: str) -> Optional[User]:
-        user = UserService.get_user_by_email(email)
+    async def authenticate_user(self, email: str, password: str) -> Optional[User]:
+        user = await self.get_user_by_email(email)
         if not user:
             return None
-        if not UserService.verify_password(password, user.password_hash):
+        if not await self.verify_password(password, user.password_hash):
             return None
         return user
 
@@ -0,0 +1,97 @@
+"""Bandwidth vs CPU of each response encoding on realistic property payloads.
+
+Builds a search page (Property list) and a property detail payload, then for
+gzip, brotli and zstd at a few levels reports compressed size, compression
+and decompression time, and the total time to deliver the body over a
+link of --mbps (compression + transfer), against sending it uncompressed.
+The last column is the cost when the compressed body is served from the
+middleware's cache, which is only the transfer.
+
+Usage: python benchmarks/compression_bench.py [--page 50] [--mbps 20] [--rounds 200]
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.property.services import serialize_properties, transform_property_detail  # noqa: E402
+from core.serialization import dumps, json_array  # noqa: E402
+from transform_bench import make_records  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def codecs() -> list:
+    """(label, compress, decompress) for every encoding and level available here"""
+    found = []
+    for level in (1, 6, 9):
+        found.append((f"gzip-{level}", lambda body, level=level: gzip.compress(body, level, mtime=0), gzip.decompress))
+    if brotli is not None:
+        for quality in (1, 5, 11):
+            found.append((f"br-{quality}", lambda body, quality=quality: brotli.compress(body, quality=quality), brotli.decompress))
+    if zstandard is not None:
+        decompressor = zstandard.ZstdDecompressor()
+        for level in (1, 3, 9):
+            compressor = zstandard.ZstdCompressor(level=level)
+            found.append((f"zstd-{level}", compressor.compress, decompressor.decompress))
+    return found
+
+
+def best_time(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(label: str, body: bytes, mbps: float, rounds: int):
+    bytes_per_second = mbps * 1_000_000 / 8
+    identity_ms = len(body) / bytes_per_second * 1000
+    print(f"\n{label}: {len(body):,} bytes, identity transfer {identity_ms:.2f} ms at {mbps:g} Mbit/s")
+    print(f"{'encoding':<9} {'bytes':>8} {'ratio':>6} {'compress':>10} {'decompress':>11} {'total':>9} {'cached':>9}")
+    for name, compress, decompress in codecs():
+        compressed = compress(body)
+        compress_ms = best_time(lambda: compress(body), rounds) * 1000
+        decompress_ms = best_time(lambda: decompress(compressed), rounds) * 1000
+        transfer_ms = len(compressed) / bytes_per_second * 1000
+        print(
+            f"{name:<9} {len(compressed):>8,} {len(body) / len(compressed):>5.1f}x "
+            f"{compress_ms:>8.3f}ms {decompress_ms:>9.3f}ms "
+            f"{compress_ms + transfer_ms:>7.2f}ms {transfer_ms:>7.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--mbps", type=float, default=20.0)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    records = make_records(args.page)
+    images = [[f"https://cdn.example.com/{record['ListingKey']}/{n}.jpg" for n in range(8)] for record in records]
+    page = json_array(serialize_properties(records, images))
+    detail = dumps(transform_property_detail(records[0], images[0], records[0]["ListingKey"]))
+
+    missing = [name for name, module in (("brotli", brotli), ("zstandard", zstandard)) if module is None]
+    if missing:
+        print(f"not installed, skipped: {', '.join(missing)}")
+    report(f"search page ({args.page} properties)", page, args.mbps, args.rounds)
+    report("property detail", detail, args.mbps, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Login throughput per worker: bcrypt on the event loop vs the password pool.
+
+In-process (default) it verifies one bcrypt hash many times concurrently,
+first inline on the event loop as the login handler used to, then through
+core.security.password_pool, and reports verifies/s plus the worst event
+loop stall seen by a 10 ms ticker.
+
+With --url it drives a running server's /api/v1/users/login instead and
+reports logins/s and the status code mix (503s mean the queue limit hit).
+
+Usage:
+    python benchmarks/login_bench.py [--logins 200] [--concurrency 50]
+    python benchmarks/login_bench.py --url http://localhost:8000 --email a@b.co --password secret
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.security import PasswordPoolFull, password_pool, pwd_context  # noqa: E402
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Largest delay past its deadline seen by a periodic ticker"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_burst(label: str, verify, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes: Counter = Counter()
+
+    async def one():
+        async with semaphore:
+            try:
+                outcomes["ok" if await verify() else "mismatch"] += 1
+            except PasswordPoolFull:
+                outcomes["rejected"] += 1
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_stall = await watcher
+    print(
+        f"{label:<10} {logins / elapsed:8.1f} verifies/s  "
+        f"max loop stall {worst_stall * 1000:7.1f} ms  {dict(outcomes)}"
+    )
+
+
+async def in_process(logins: int, concurrency: int):
+    password = "correct horse battery staple"
+    hashed = pwd_context.hash(password)
+    print(f"{logins} verifies, concurrency {concurrency}, pool of {password_pool.workers} "
+          f"(+{password_pool.max_queue} queued)")
+
+    async def inline():
+        return pwd_context.verify(password, hashed)
+
+    async def pooled():
+        return await password_pool.run(pwd_context.verify, password, hashed)
+
+    await run_burst("inline", inline, logins, concurrency)
+    await run_burst("pool", pooled, logins, concurrency)
+    password_pool.shutdown()
+
+
+async def against_server(url: str, email: str, password: str, logins: int, concurrency: int):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: Counter = Counter()
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        async def one():
+            async with semaphore:
+                response = await client.post("/api/v1/users/login", json={"email": email, "password": password})
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(logins)])
+        elapsed = time.perf_counter() - started
+    print(f"{logins} logins in {elapsed:.2f} s: {logins / elapsed:.1f} logins/s  statuses {dict(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(against_server(args.url, args.email, args.password, args.logins, args.concurrency))
+    else:
+        asyncio.run(in_process(args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Cost of serving one page of properties: response_model path vs pre-serialized bytes.
+
+Mounts four routes on an in-process FastAPI app and times requests to them
+over ASGI, so framework work is included but the network is not:
+
+    before   Property models returned through response_model=List[Property]
+             (validated again, then encoded with the default JSON encoder)
+    cold     RawJSONResponse from transform_properties_json_parts, cache cleared
+    cached   the same with every listing's bytes already cached
+    floor    an empty RawJSONResponse, the per-request framework cost
+
+Usage: python benchmarks/serialize_bench.py [--page 50] [--requests 500]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.property.models import Property  # noqa: E402
+from app.property.services import (  # noqa: E402
+    property_json_cache,
+    transform_properties,
+    transform_properties_json_parts
+)
+from core import serialization  # noqa: E402
+from core.serialization import RawJSONResponse, json_array  # noqa: E402
+from transform_bench import make_records  # noqa: E402
+
+
+def build_app(records: list, images: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before", response_model=List[Property])
+    async def before():
+        return transform_properties(records, images)
+
+    @app.get("/cold", response_model=List[Property])
+    async def cold():
+        property_json_cache.clear()
+        return RawJSONResponse(json_array(transform_properties_json_parts(records, images)))
+
+    @app.get("/cached", response_model=List[Property])
+    async def cached():
+        return RawJSONResponse(json_array(transform_properties_json_parts(records, images)))
+
+    @app.get("/floor")
+    async def floor():
+        return RawJSONResponse(b"[]")
+
+    return app
+
+
+async def run(page: int, requests: int):
+    records = make_records(page)
+    images = [[f"https://cdn.example.com/{record['ListingKey']}/{n}.jpg" for n in range(8)] for record in records]
+    app = build_app(records, images)
+    encoder = "orjson" if serialization.orjson is not None else "json (orjson not installed)"
+    print(f"{page}-item pages, {requests} requests per route, encoder: {encoder}")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        bodies = {}
+        for route in ("before", "cold", "cached", "floor"):
+            bodies[route] = (await client.get(f"/{route}")).json()  # warm up
+            started = time.perf_counter()
+            for _ in range(requests):
+                response = await client.get(f"/{route}")
+            elapsed = time.perf_counter() - started
+            per_page = elapsed / requests * 1000
+            print(f"{route:<8} {per_page:7.3f} ms/page  {requests / elapsed:8.0f} pages/s  {len(response.content):>7,} bytes")
+    if bodies["before"] != bodies["cold"]:
+        print("warning: payloads differ between the before and after paths")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.page, args.requests))
+
+
+if __name__ == "__main__":
+    main()
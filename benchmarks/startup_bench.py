@@ -0,0 +1,85 @@
+"""Cold start of main:app: time from interpreter start to a ready app.
+
+Each run is a fresh interpreter that imports main and enters the app
+lifespan, the same work uvicorn does before accepting requests. Reports
+the import and lifespan phases separately, plus the slowest top-level
+imports from ``python -X importtime``.
+
+Usage: python benchmarks/startup_bench.py [--runs 5] [--top 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def start():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(start())
+print(json.dumps({"import": imported - started, "lifespan": ready - imported}))
+"""
+
+
+def run_probe() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is two spaces per level; keep what main imports directly
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.runs)]
+    for phase in ("import", "lifespan"):
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<9} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    totals = [(run["import"] + run["lifespan"]) * 1000 for run in runs]
+    print(f"{'ready':<9} median {statistics.median(totals):8.1f} ms   min {min(totals):8.1f} ms")
+
+    if args.top:
+        print("\nslowest imports made by main (cumulative):")
+        for microseconds, name in slowest_imports(args.top):
+            print(f"  {microseconds / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
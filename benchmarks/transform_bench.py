@@ -0,0 +1,81 @@
+"""Throughput of the batch property transform against the per-row path.
+
+Usage: python benchmarks/transform_bench.py [--records 10000] [--rounds 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.property.services import (  # noqa: E402
+    property_list_adapter,
+    transform_properties,
+    transform_properties_json,
+    transform_property
+)
+
+def make_records(count: int) -> list:
+    random.seed(7)
+    records = []
+    for i in range(count):
+        records.append({
+            "ListingKey": f"W{i:07d}",
+            "PublicRemarks": "Bright renovated home close to transit and schools. " * random.randint(1, 12),
+            "PropertyAddress": f"{random.randint(1, 999)} Queen St W",
+            "City": random.choice(["Toronto", "Mississauga", "Brampton", "Oakville"]),
+            "StateOrProvince": "ON",
+            "PostalCode": "M5V 2T6",
+            "Country": "CA",
+            # MLS mixes numbers, numeric strings and nulls
+            "ListPrice": random.choice([random.randint(300000, 3000000), str(random.randint(1500, 5000)), None]),
+            "BedroomsTotal": random.choice([random.randint(0, 6), None]),
+            "BathroomsTotalInteger": random.randint(1, 5),
+            "LivingArea": random.choice([random.randint(400, 4000), "", None]),
+            "Latitude": 43.6 + random.random() * 0.3,
+            "Longitude": -79.6 + random.random() * 0.4,
+            "PropertyType": random.choice(["Residential", "Condo", "Commercial"]),
+            "MlsStatus": random.choice(["Active", "Pending", "Sold"]),
+            "Features": "Garage, Fireplace, Central Air" if i % 3 else "",
+            "ListingContractDate": "2024-05-01",
+            "ModificationTimestamp": "2024-06-01T12:00:00Z"
+        })
+    return records
+
+def timed(label: str, fn, rounds: int, count: int, baseline: float = None) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    speedup = f"  ({baseline / best:.1f}x)" if baseline else ""
+    print(f"{label:<34} {best * 1000:8.1f} ms  {count / best:>10,.0f} records/s{speedup}")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    images = [[f"https://cdn.example.com/{record['ListingKey']}/1.jpg"] for record in records]
+    print(f"{args.records:,} records, best of {args.rounds} rounds")
+
+    per_row = timed(
+        "per-row transform_property",
+        lambda: [transform_property(record, urls) for record, urls in zip(records, images)],
+        args.rounds, args.records
+    )
+    timed("batch transform_properties", lambda: transform_properties(records, images), args.rounds, args.records, per_row)
+    per_row_json = timed(
+        "per-row + JSON array",
+        lambda: property_list_adapter.dump_json([transform_property(record, urls) for record, urls in zip(records, images)]),
+        args.rounds, args.records
+    )
+    timed("batch transform_properties_json", lambda: transform_properties_json(records, images), args.rounds, args.records, per_row_json)
+
+if __name__ == "__main__":
+    main()
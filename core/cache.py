@@ -0,0 +1,421 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from core.singleflight import SingleFlight
+
+# Read-through caching of small reference tables (flags, questions)
+REFERENCE_CACHE_ENABLED = os.getenv("REFERENCE_CACHE_ENABLED", "true").lower() == "true"
+# Seconds before an entry is reloaded; 0 keeps entries until a write invalidates them
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", 0))
+# SQLite file shared by the workers on a host to publish table versions
+REFERENCE_CACHE_SHARED_PATH = os.getenv("REFERENCE_CACHE_SHARED_PATH", "")
+# How often a worker looks for invalidations made by other workers
+REFERENCE_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("REFERENCE_CACHE_VERSION_CHECK_INTERVAL", 1.0))
+
+# (value, expires_at, stale_until)
+CacheRecord = Tuple[Any, float, float]
+
+
+class DiskCacheTier:
+    """Shared second cache tier backed by a local SQLite file.
+
+    Every uvicorn worker on the host opens the same file, so it acts as a
+    small local Redis stand-in. Values must be JSON serializable.
+
+    Writes are queued to one background thread, in order, so the event loop
+    never waits on a commit or a purge. Reads use their own WAL connection,
+    which writers do not block, and give up after ``busy_timeout`` seconds
+    so a locked file costs a cache miss rather than a stalled loop. Keys
+    with a queued delete read as missing until it lands.
+    """
+
+    def __init__(self, path: str, purge_every: int = 500, busy_timeout: float = 0.05):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Only the writer thread waits out a lock, so it keeps sqlite's default
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, stale_until REAL NOT NULL)"
+        )
+        self._read_lock = threading.Lock()
+        self._read_conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._pending_lock = threading.Lock()
+        # Keys (None for a clear) with deletes queued but not yet written
+        self._deleting: Dict[Optional[str], int] = {}
+        self._purge_every = purge_every
+        self._writes = 0
+
+    def _queue(self, fn: Callable, *args):
+        self._writer.submit(self._run_write, fn, *args)
+
+    def _run_write(self, fn: Callable, *args):
+        try:
+            with self._lock:
+                fn(*args)
+        except Exception as e:
+            print(f"Warning: shared cache write failed: {e}")
+
+    def _queue_delete(self, key: Optional[str], fn: Callable, *args):
+        with self._pending_lock:
+            self._deleting[key] = self._deleting.get(key, 0) + 1
+
+        def delete():
+            try:
+                fn(*args)
+            finally:
+                with self._pending_lock:
+                    self._deleting[key] -= 1
+                    if not self._deleting[key]:
+                        del self._deleting[key]
+        self._queue(delete)
+
+    def get(self, key: str) -> Optional[CacheRecord]:
+        if self._deleting and (key in self._deleting or None in self._deleting):
+            return None
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT value, expires_at, stale_until FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[2] < time.time():
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key: str, record: CacheRecord):
+        value, expires_at, stale_until = record
+        self._queue(self._write, key, json.dumps(value), expires_at, stale_until)
+
+    def _write(self, key: str, value: str, expires_at: float, stale_until: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+            (key, value, expires_at, stale_until)
+        )
+        self._writes += 1
+        if self._writes % self._purge_every == 0:
+            self._conn.execute("DELETE FROM cache WHERE stale_until < ?", (time.time(),))
+
+    def delete(self, key: str):
+        self._queue_delete(key, self._conn.execute, "DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._queue_delete(None, self._conn.execute, "DELETE FROM cache")
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+        with self._read_lock:
+            self._read_conn.close()
+        with self._lock:
+            self._conn.close()
+
+
+class TTLCache:
+    """Size-bounded in-process LRU with per-entry TTL and an optional shared tier.
+
+    Entries are fresh until their TTL, then served stale for ``stale_ttl``
+    seconds while a single background refresh runs. Concurrent misses for
+    the same key share one load.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 60.0,
+        stale_ttl: float = 0.0,
+        shared: Optional[DiskCacheTier] = None,
+        name: str = "cache"
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, CacheRecord]" = OrderedDict()
+        self._flight = SingleFlight(name)
+        self._refreshing: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: str) -> Optional[CacheRecord]:
+        now = time.time()
+        record = self._entries.get(key)
+        if record is not None:
+            if record[2] >= now:
+                self._entries.move_to_end(key)
+                return record
+            del self._entries[key]
+        if self.shared is not None:
+            try:
+                record = self.shared.get(key)
+            except Exception as e:
+                print(f"Warning: shared cache read failed for {key}: {e}")
+                record = None
+            if record is not None:
+                self._store_local(key, record)
+                return record
+        return None
+
+    def _store_local(self, key: str, record: CacheRecord):
+        self._entries[key] = record
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a fresh cached value or None"""
+        record = self._lookup(key)
+        if record is None or record[1] < time.time():
+            return None
+        return record[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        record = (value, now + ttl, now + ttl + self.stale_ttl)
+        self._store_local(key, record)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, record)
+            except Exception as e:
+                print(f"Warning: shared cache write failed for {key}: {e}")
+
+    def replace(self, key: str, update: Callable[[Any], Any]) -> bool:
+        """Apply ``update`` to a fresh cached value, keeping its original expiry.
+
+        Returns False, changing nothing, when there is no fresh value.
+        """
+        record = self._lookup(key)
+        if record is None or record[1] < time.time():
+            return False
+        record = (update(record[0]), record[1], record[2])
+        self._store_local(key, record)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, record)
+            except Exception as e:
+                print(f"Warning: shared cache write failed for {key}: {e}")
+        return True
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+        async def load_and_store():
+            value = await loader()
+            self.set(key, value, ttl)
+            return value
+        return await self._flight.do(key, load_and_store)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """Return the cached value for key, loading it at most once on a miss"""
+        record = self._lookup(key)
+        if record is not None:
+            value, expires_at, _ = record
+            if expires_at >= time.time():
+                return value
+            # Stale: answer now and refresh in the background
+            if not self._flight.in_flight(key):
+                task = asyncio.ensure_future(self._load(key, loader, ttl))
+                self._refreshing.add(task)
+                task.add_done_callback(self._finish_refresh)
+            return value
+        return await self._load(key, loader, ttl)
+
+    def _finish_refresh(self, task: asyncio.Task):
+        self._refreshing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Warning: background cache refresh failed: {task.exception()}")
+
+
+class SharedVersions:
+    """Per-name version counters in a SQLite file shared by all workers.
+
+    A writer bumps the version of what it changed; other workers notice
+    the new number and drop their copies. It stands in for pub/sub.
+
+    The file is opened on first use, not at import. If it cannot be opened,
+    a warning is printed once and every version reads as 0, so caches
+    behave as if they had no shared versions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._unavailable = False
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and not self._unavailable:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+                self._conn = conn
+            except (OSError, sqlite3.Error) as e:
+                self._unavailable = True
+                print(f"Warning: shared versions at {self.path} unavailable, invalidations stay per worker: {e}")
+        return self._conn
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return 0
+            row = conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name: str) -> int:
+        with self._lock:
+            if self._connection() is None:
+                return 0
+            self._conn.execute(
+                "INSERT INTO versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                (name,)
+            )
+            return self._conn.execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class VersionedCache:
+    """In-process read-through cache for one table, invalidated on writes.
+
+    Reads are dict lookups. A write clears the local entries at once and
+    bumps the table's shared version, which other workers pick up within
+    ``check_interval`` seconds. Loads racing a write are not stored.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float = 0.0,
+        versions: Optional[SharedVersions] = None,
+        check_interval: float = 1.0,
+        enabled: bool = True
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.versions = versions
+        self.check_interval = check_interval
+        self.enabled = enabled
+        # key -> (value, expires_at); expires_at is None without a TTL
+        self._entries: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._generation = 0
+        # Read on the first lookup rather than here, at import
+        self._shared_version: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._flight = SingleFlight(f"{name}_cache")
+
+    def _read_shared_version(self) -> Optional[int]:
+        if self.versions is None:
+            return 0
+        try:
+            return self.versions.get(self.name)
+        except Exception as e:
+            print(f"Warning: shared version read failed for {self.name}: {e}")
+            return self._shared_version
+
+    def _sync(self):
+        """Drop local entries if another worker changed the table"""
+        if self.versions is None or time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+        version = self._read_shared_version()
+        if self._shared_version is None:
+            self._shared_version = version
+        elif version != self._shared_version:
+            self._shared_version = version
+            self._clear_local()
+
+    def _clear_local(self):
+        self._entries.clear()
+        self._generation += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        self._sync()
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: str, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        self._entries[key] = (value, expires_at)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, loading it at most once on a miss"""
+        if not self.enabled:
+            return await loader()
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        # Keyed by generation too, so a read after a write never joins a load that began before it
+        generation = self._generation
+
+        async def load_and_store():
+            loaded = await loader()
+            if generation == self._generation:
+                self.set(key, loaded)
+            return loaded
+        return await self._flight.do(f"{generation}:{key}", load_and_store)
+
+    def invalidate(self):
+        """Forget every entry here and tell the other workers to do the same"""
+        self._clear_local()
+        if self.versions is not None:
+            try:
+                self._shared_version = self.versions.bump(self.name)
+            except Exception as e:
+                print(f"Warning: shared version bump failed for {self.name}: {e}")
+
+
+_reference_versions: Optional[SharedVersions] = None
+
+def reference_cache(name: str) -> VersionedCache:
+    """VersionedCache for a reference table, configured from REFERENCE_CACHE_*"""
+    global _reference_versions
+    if REFERENCE_CACHE_SHARED_PATH and _reference_versions is None:
+        _reference_versions = SharedVersions(REFERENCE_CACHE_SHARED_PATH)
+    return VersionedCache(
+        name,
+        ttl=REFERENCE_CACHE_TTL,
+        versions=_reference_versions,
+        check_interval=REFERENCE_CACHE_VERSION_CHECK_INTERVAL,
+        enabled=REFERENCE_CACHE_ENABLED
+    )
@@ -0,0 +1,241 @@
+import gzip
+import os
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.cache import TTLCache
+from core.metrics import metrics
+
+# brotli and zstandard are optional; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Response compression
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+# Server preference when the client accepts several encodings equally
+COMPRESSION_ENCODINGS = [
+    name.strip() for name in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if name.strip()
+]
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+# Compressed bodies of public responses with an ETag, reused until the ETag changes
+COMPRESSION_CACHE_TTL = float(os.getenv("COMPRESSION_CACHE_TTL", 600))
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", 2048))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+
+class GzipStream:
+    def __init__(self):
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdStream:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# encoding -> (whole-body compressor, streaming compressor factory)
+ENCODERS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[], object]]] = {
+    "gzip": (lambda body: gzip.compress(body, COMPRESSION_GZIP_LEVEL, mtime=0), GzipStream)
+}
+if brotli is not None:
+    ENCODERS["br"] = (lambda body: brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY), BrotliStream)
+if zstandard is not None:
+    ENCODERS["zstd"] = (lambda body: zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(body), ZstdStream)
+
+
+def choose_encoding(accept_encoding: str, preference: List[str] = COMPRESSION_ENCODINGS) -> Optional[str]:
+    """Best available encoding for an Accept-Encoding header, or None for identity"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for name in preference:
+        if name not in ENCODERS:
+            continue
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES or content_type.endswith("+json")
+
+
+class CompressionMiddleware:
+    """Compress responses with zstd, brotli or gzip, as negotiated by Accept-Encoding.
+
+    Small bodies, already-encoded responses and non-text content types pass
+    through untouched. Streaming bodies are compressed chunk by chunk and
+    flushed, so NDJSON streams still arrive incrementally. Compressed
+    bodies of public responses with an ETag are cached, so hot listings
+    are compressed once per version rather than once per request.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, cache: Optional[TTLCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        await CompressingResponder(self, encoding, send).run(scope, receive)
+
+
+class CompressingResponder:
+    """Send wrapper for one response; holds the start message until the first body chunk"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.mode = "pending"  # pending, identity or stream
+        self.stream = None
+
+    async def run(self, scope: Scope, receive: Receive):
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    def _should_compress(self, headers: MutableHeaders) -> bool:
+        status = self.start["status"]
+        return (
+            status not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and is_compressible(headers.get("content-type", ""))
+        )
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.mode == "identity":
+            await self.send(message)
+            return
+        if self.mode == "stream":
+            await self._send_stream_chunk(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start["headers"])
+        if not self._should_compress(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+            self.mode = "identity"
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        # The representation depends on Accept-Encoding even when sent uncompressed
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoding is None:
+            self.mode = "identity"
+            await self.send(self.start)
+            await self.send(message)
+            return
+        headers["Content-Encoding"] = self.encoding
+        if not more_body:
+            compressed = self._compress_whole(body, headers)
+            headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streaming: the length is unknown up front
+        del headers["Content-Length"]
+        self.mode = "stream"
+        self.stream = ENCODERS[self.encoding][1]()
+        await self.send(self.start)
+        await self._send_stream_chunk(message)
+
+    def _compress_whole(self, body: bytes, headers: MutableHeaders) -> bytes:
+        cache = self.middleware.cache
+        etag = headers.get("etag")
+        cacheable = cache is not None and etag and "public" in headers.get("cache-control", "")
+        key = f"{self.encoding}:{len(body)}:{etag}" if cacheable else None
+        if key is not None:
+            compressed = cache.get(key)
+            if compressed is not None:
+                metrics.incr("compression.cache_hits")
+                return compressed
+        started = time.perf_counter()
+        compressed = ENCODERS[self.encoding][0](body)
+        metrics.observe(f"compression.{self.encoding}.seconds", time.perf_counter() - started)
+        metrics.incr("compression.bytes_in", len(body))
+        metrics.incr("compression.bytes_out", len(compressed))
+        if key is not None:
+            cache.set(key, compressed)
+        return compressed
+
+    async def _send_stream_chunk(self, message: Message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        chunk = self.stream.compress(body) if body else b""
+        if not more_body:
+            chunk += self.stream.finish()
+        metrics.incr("compression.bytes_in", len(body))
+        metrics.incr("compression.bytes_out", len(chunk))
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+compressed_cache = TTLCache(
+    max_entries=COMPRESSION_CACHE_MAX_ENTRIES,
+    ttl=COMPRESSION_CACHE_TTL,
+    name="compressed_cache"
+)
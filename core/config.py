@@ -4,20 +4,20 @@ from typing import List
 from pydantic import field_validator, computed_field
 
 class Settings(BaseSettings):
-    # MLS API Configuration
-    MLS_URL: str
-    MLS_AUTHTOKEN: str
-    MLS_PROPERTY_TYPE: str
-    MLS_RENTAL_APPLICATION: str
-    MLS_ORIFINATING_SYSTEM_NAME: str
-    MLS_TOP_LIMIT: str
-    MLS_PPROPERTY_FILTER_FIELDS: str
-    MLS_PROPERTY_IMAGE_FILTER_FIELDS: str
+    # MLS API Configuration (checked where used, so the app boots without it)
+    MLS_URL: str = ""
+    MLS_AUTHTOKEN: str = ""
+    MLS_PROPERTY_TYPE: str = ""
+    MLS_RENTAL_APPLICATION: str = ""
+    MLS_ORIFINATING_SYSTEM_NAME: str = ""
+    MLS_TOP_LIMIT: str = ""
+    MLS_PPROPERTY_FILTER_FIELDS: str = ""
+    MLS_PROPERTY_IMAGE_FILTER_FIELDS: str = ""
     
-    # Supabase Configuration
-    SUPABASE_URL: str
-    SUPABASE_ANON_KEY: str
-    SUPABASE_SERVICE_ROLE_KEY: str
+    # Supabase Configuration (checked on first database use)
+    SUPABASE_URL: str = ""
+    SUPABASE_ANON_KEY: str = ""
+    SUPABASE_SERVICE_ROLE_KEY: str = ""
 
     # JWT Configuration
     SECRET_KEY: str = "your-secret-key-here"
@@ -0,0 +1,232 @@
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import httpx
+from dotenv import load_dotenv
+
+from core.http import http2_available
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or SUPABASE_ANON_KEY
+
+# Connection pool for the PostgREST API
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", 20))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", 10))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", 30.0))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", 5.0))
+SUPABASE_READ_TIMEOUT = float(os.getenv("SUPABASE_READ_TIMEOUT", 15.0))
+SUPABASE_POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", 10.0))
+
+# Rows per request when streaming a whole table
+SUPABASE_EXPORT_PAGE_SIZE = int(os.getenv("SUPABASE_EXPORT_PAGE_SIZE", 1000))
+
+# PostgREST filters as query params, e.g. {"id": "eq.<uuid>"}
+Filters = Dict[str, str]
+Rows = Union[Dict[str, Any], List[Dict[str, Any]]]
+
+
+def in_filter(values: List[Any]) -> str:
+    """PostgREST ``in`` filter with every value quoted, e.g. ``in.("a","b")``"""
+    quoted = []
+    for value in values:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        quoted.append(f'"{escaped}"')
+    return f"in.({','.join(quoted)})"
+
+
+class SupabaseError(Exception):
+    """Error response from the Supabase REST API"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class SupabaseRest:
+    """Async access to Supabase tables through PostgREST (``/rest/v1``).
+
+    All requests share one pooled httpx client, so database round-trips
+    never block the event loop. Requests run with the service key unless
+    ``auth`` passes a caller's Authorization header, in which case they run
+    as that user under row-level security.
+    """
+
+    def __init__(self, url: str, key: str, anon_key: Optional[str] = None):
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.key = key
+        self.anon_key = anon_key or key
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=SUPABASE_HTTP2 and http2_available(),
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                SUPABASE_READ_TIMEOUT,
+                connect=SUPABASE_CONNECT_TIMEOUT,
+                pool=SUPABASE_POOL_TIMEOUT
+            ),
+            headers={
+                "apikey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Content-Type": "application/json"
+            }
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(
+        self,
+        method: str,
+        table: str,
+        params: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        auth: Optional[str] = None
+    ) -> httpx.Response:
+        if auth:
+            headers = {**(headers or {}), "apikey": self.anon_key, "Authorization": auth}
+        try:
+            response = await self.client.request(method, f"/{table}", params=params, json=json, headers=headers)
+        except httpx.HTTPError as e:
+            raise SupabaseError(f"Supabase request failed: {e}", 503)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message") or response.text
+            except ValueError:
+                message = response.text
+            raise SupabaseError(message, response.status_code)
+        return response
+
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Filters] = None,
+        columns: str = "*",
+        single: bool = False,
+        auth: Optional[str] = None
+    ) -> Rows:
+        """Rows matching the filters; ``single`` requires exactly one row and returns it"""
+        params = {"select": columns, **(filters or {})}
+        headers = {"Accept": "application/vnd.pgrst.object+json"} if single else None
+        response = await self._request("GET", table, params=params, headers=headers, auth=auth)
+        return response.json()
+
+    async def select_page(
+        self,
+        table: str,
+        filters: Optional[Filters] = None,
+        columns: str = "*",
+        limit: int = 100,
+        after: Optional[str] = None,
+        key: str = "id",
+        auth: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One keyset page ordered by ``key``, and the key to resume after (None on the last page).
+
+        ``key`` is always selected so the next page can be addressed.
+        """
+        if columns != "*" and key not in columns.split(","):
+            columns = f"{key},{columns}"
+        params = {"select": columns, **(filters or {}), "order": f"{key}.asc", "limit": str(limit)}
+        if after is not None:
+            params[key] = f"gt.{after}"
+        response = await self._request("GET", table, params=params, auth=auth)
+        rows = response.json()
+        next_after = str(rows[-1][key]) if len(rows) == limit else None
+        return rows, next_after
+
+    async def iter_rows(
+        self,
+        table: str,
+        filters: Optional[Filters] = None,
+        columns: str = "*",
+        page_size: int = SUPABASE_EXPORT_PAGE_SIZE,
+        key: str = "id",
+        auth: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Every matching row, fetched one keyset page at a time"""
+        after = None
+        while True:
+            rows, after = await self.select_page(table, filters, columns, page_size, after, key, auth)
+            for row in rows:
+                yield row
+            if after is None:
+                return
+
+    async def insert(self, table: str, rows: Rows, auth: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Insert one or more rows and return them as stored"""
+        response = await self._request("POST", table, json=rows, headers={"Prefer": "return=representation"}, auth=auth)
+        return response.json()
+
+    async def upsert(
+        self,
+        table: str,
+        rows: Rows,
+        on_conflict: str,
+        ignore_duplicates: bool = False,
+        returning: bool = True,
+        auth: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Insert rows in one request, merging into (or skipping) rows that clash on ``on_conflict``.
+
+        With ``ignore_duplicates`` only the newly inserted rows are returned.
+        """
+        resolution = "ignore-duplicates" if ignore_duplicates else "merge-duplicates"
+        prefer = f"resolution={resolution},return={'representation' if returning else 'minimal'}"
+        response = await self._request(
+            "POST", table, params={"on_conflict": on_conflict}, json=rows, headers={"Prefer": prefer}, auth=auth
+        )
+        return response.json() if returning else []
+
+    async def update(self, table: str, values: Dict[str, Any], filters: Filters, auth: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Update the rows matching the filters and return them"""
+        response = await self._request(
+            "PATCH", table, params=filters, json=values, headers={"Prefer": "return=representation"}, auth=auth
+        )
+        return response.json()
+
+    async def delete(
+        self, table: str, filters: Filters, returning: bool = False, auth: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Delete the rows matching the filters, returning them if ``returning``"""
+        headers = {"Prefer": "return=representation"} if returning else None
+        response = await self._request("DELETE", table, params=filters, headers=headers, auth=auth)
+        return response.json() if returning else []
+
+
+_database: Optional[SupabaseRest] = None
+
+def get_database() -> SupabaseRest:
+    """Shared Supabase client, constructed on first use"""
+    global _database
+    if _database is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise SupabaseError("Supabase URL or Key not set in environment variables", 503)
+        _database = SupabaseRest(SUPABASE_URL, SUPABASE_KEY, SUPABASE_ANON_KEY)
+    return _database
+
+async def close_database():
+    global _database
+    if _database is not None:
+        await _database.close()
+        _database = None
@@ -0,0 +1,71 @@
+import json
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag from a hash of JSON-serializable parts"""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+def content_etag(body: bytes) -> str:
+    """Weak ETag from a hash of a serialized response body"""
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+def cache_control(max_age: int, stale_while_revalidate: int = 0, private: bool = False) -> str:
+    """Cache-Control value for a route's caching policy; max_age 0 means always revalidate"""
+    scope = "private" if private else "public"
+    if max_age <= 0:
+        return f"{scope}, no-cache"
+    value = f"{scope}, max-age={max_age}"
+    if stale_while_revalidate > 0:
+        value += f", stale-while-revalidate={stale_while_revalidate}"
+    return value
+
+def http_date(timestamp: Optional[str]) -> Optional[str]:
+    """HTTP-date for an ISO 8601 timestamp such as MLS ModificationTimestamp, None if unparseable"""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return format_datetime(parsed.astimezone(timezone.utc), usegmt=True)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match names etag, compared weakly"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    """Whether a conditional GET can be answered with 304.
+
+    If-None-Match wins when present; If-Modified-Since is only consulted
+    without it, as RFC 9110 requires.
+    """
+    if request.headers.get("if-none-match"):
+        return etag_matches(request, etag)
+    since = request.headers.get("if-modified-since")
+    if not since or not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
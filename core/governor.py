@@ -0,0 +1,450 @@
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+import httpx
+
+from core.metrics import metrics
+
+# Statuses that mean the upstream is shedding load; they carry Retry-After
+THROTTLE_STATUSES = (429, 503)
+# Other statuses worth retrying
+RETRY_STATUSES = (500, 502, 504)
+# Failures that happen before the request reaches the upstream, safe to retry for any method
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class UpstreamUnavailable(Exception):
+    """The governor refused a call: breaker open, or throttled for too long"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: grows by about one per window of fast successes,
+    shrinks multiplicatively on throttling, errors or slow responses.
+
+    Waiters are served in arrival order as slots free up or the limit grows.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff_ratio: float = 0.5,
+        latency_backoff_ratio: float = 0.9,
+        decrease_interval: float = 1.0
+    ):
+        self.name = name
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        # One decrease per interval, so a burst of failures from one window counts once
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._decreased_at = 0.0
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        metrics.gauge(f"{self.name}.queued", len(self._waiters))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as we were cancelled: pass it on
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+        metrics.gauge(f"{self.name}.queued", len(self._waiters))
+        metrics.gauge(f"{self.name}.in_flight", self.in_flight)
+
+    def _decrease(self, ratio: float):
+        now = time.monotonic()
+        if now - self._decreased_at < self.decrease_interval:
+            return
+        self._decreased_at = now
+        self.limit = max(float(self.min_limit), self.limit * ratio)
+        metrics.gauge(f"{self.name}.limit", self.limit)
+
+    def on_success(self, latency: float):
+        if latency > self.latency_target:
+            self._decrease(self.latency_backoff_ratio)
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            metrics.gauge(f"{self.name}.limit", self.limit)
+            self._wake()
+
+    def on_overload(self):
+        self._decrease(self.backoff_ratio)
+
+
+class CircuitBreaker:
+    """Opens when the failure ratio over a sliding window crosses a threshold.
+
+    After ``open_seconds`` one probe call is let through (half-open); its
+    outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, name: str, failure_ratio: float, min_calls: int, window: float, open_seconds: float):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self.retry_after() > 0:
+            return False
+        # Half-open: a single probe at a time
+        if self._probe_in_flight:
+            return False
+        self.state = "half_open"
+        self._probe_in_flight = True
+        return True
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._probe_in_flight = False
+            if ok:
+                self._close()
+            else:
+                self._open(now)
+            return
+        self._calls.append((now, ok))
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+        failures = sum(1 for _, succeeded in self._calls if not succeeded)
+        if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_ratio:
+            self._open(now)
+
+    def release_probe(self):
+        """Forget a half-open probe that ended without an outcome (e.g. cancelled)"""
+        if self.state == "half_open" and self._probe_in_flight:
+            self._probe_in_flight = False
+            self.state = "open"
+
+    def _open(self, now: float):
+        if self.state != "open":
+            metrics.incr(f"{self.name}.opened")
+        self.state = "open"
+        self.opened_at = now
+        self._calls.clear()
+        metrics.gauge(f"{self.name}.open", 1)
+
+    def _close(self):
+        self.state = "closed"
+        self._calls.clear()
+        metrics.gauge(f"{self.name}.open", 0)
+
+
+class RetryBudget:
+    """Token bucket that caps retries to a fraction of traffic.
+
+    Each first attempt deposits ``ratio`` tokens and each retry spends one;
+    ``min_per_second`` keeps a trickle of retries possible at low traffic.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._refilled_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+
+    def deposit(self):
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class HedgePolicy:
+    """When to send a backup copy of a slow call, for one call type.
+
+    The hedge delay is a percentile of recent call latencies for the type,
+    whatever their outcome, clamped to [min_delay, max_delay]; until
+    ``min_samples`` are seen no hedges are sent. Hedges are capped by their
+    own budget, a fraction of the calls of this type.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float,
+        budget: RetryBudget,
+        min_delay: float = 0.05,
+        max_delay: float = 5.0,
+        window: int = 500,
+        min_samples: int = 20
+    ):
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._delay: Optional[float] = None
+        self._since_update = 0
+
+    def record(self, latency: float):
+        self._latencies.append(latency)
+        self._since_update += 1
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history"""
+        if len(self._latencies) < self.min_samples:
+            return None
+        # Re-sorting the window on every call would cost more than the lookup saves
+        if self._delay is None or self._since_update >= self.min_samples:
+            ordered = sorted(self._latencies)
+            index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+            self._delay = min(self.max_delay, max(self.min_delay, ordered[index]))
+            self._since_update = 0
+            metrics.gauge(f"{self.name}.hedge_delay", self._delay)
+        return self._delay
+
+
+def _succeeded(task: asyncio.Task) -> bool:
+    if task.cancelled() or task.exception() is not None:
+        return False
+    status = task.result().status_code
+    return status not in THROTTLE_STATUSES and status not in RETRY_STATUSES
+
+
+class UpstreamGovernor:
+    """Admission, retries and circuit breaking for every call to one upstream.
+
+    Calls pass through an AIMD concurrency limit, wait out any Retry-After
+    the upstream has announced, and are retried with full-jitter exponential
+    backoff while the retry budget allows. Non-idempotent calls are only
+    retried when the request never reached the upstream.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limiter: AdaptiveLimiter,
+        breaker: CircuitBreaker,
+        budget: RetryBudget,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 5.0,
+        max_retry_after: float = 30.0
+    ):
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self._blocked_until = 0.0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _block_for(self, seconds: float):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def _wait_if_blocked(self):
+        delay = self._blocked_until - time.monotonic()
+        if delay <= 0:
+            return
+        if delay > self.max_retry_after:
+            metrics.incr(f"{self.name}.throttled_rejections")
+            raise UpstreamUnavailable(f"{self.name} asked us to back off for {delay:.0f}s", delay)
+        await asyncio.sleep(delay)
+
+    async def _attempt(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        if not self.breaker.allow():
+            metrics.incr(f"{self.name}.breaker_rejections")
+            raise UpstreamUnavailable(f"{self.name} circuit open", self.breaker.retry_after())
+        recorded = False
+        acquired = False
+        try:
+            # Inside the try, so a probe that is cancelled or throttled before
+            # sending still gives back its half-open slot
+            await self._wait_if_blocked()
+            await self.limiter.acquire()
+            acquired = True
+            started = time.monotonic()
+            response = await send()
+            latency = time.monotonic() - started
+            metrics.observe(f"{self.name}.latency_seconds", latency)
+            if response.status_code in THROTTLE_STATUSES:
+                self.limiter.on_overload()
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after:
+                    self._block_for(retry_after)
+                self.breaker.record(response.status_code != 503)
+            elif response.status_code in RETRY_STATUSES:
+                self.limiter.on_overload()
+                self.breaker.record(False)
+            else:
+                self.limiter.on_success(latency)
+                self.breaker.record(True)
+            recorded = True
+            return response
+        except httpx.HTTPError:
+            self.limiter.on_overload()
+            self.breaker.record(False)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                self.breaker.release_probe()
+            if acquired:
+                self.limiter.release()
+
+    def _can_hedge(self, hedge: HedgePolicy) -> bool:
+        # Never hedge into a struggling upstream or past the concurrency limit
+        return (
+            self.breaker.state == "closed"
+            and self.limiter.in_flight < int(self.limiter.limit)
+            and hedge.budget.withdraw()
+        )
+
+    async def _hedged_attempt(
+        self, send: Callable[[], Awaitable[httpx.Response]], hedge: HedgePolicy
+    ) -> httpx.Response:
+        """One attempt that sends a backup copy if the first is slower than the hedge delay.
+
+        The first successful response wins and the other request is
+        cancelled; if both fail, the later outcome is returned or raised.
+        Every attempt that finishes, failed or not, is timed from the
+        primary's start, so the sample is the latency callers see; the
+        cancelled loser is left out.
+        """
+        delay = hedge.delay()
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._attempt(send))
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._can_hedge(hedge):
+                    metrics.incr(f"{hedge.name}.hedges")
+                    tasks.add(asyncio.ensure_future(self._attempt(send)))
+            while True:
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for _ in done:
+                    hedge.record(time.monotonic() - started)
+                succeeded = [task for task in done if _succeeded(task)]
+                if succeeded or not pending:
+                    winner = succeeded[0] if succeeded else done.pop()
+                    if winner is not primary:
+                        metrics.incr(f"{hedge.name}.hedge_wins")
+                    return winner.result()
+                tasks = pending
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def request(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        idempotent: bool = True,
+        hedge: Optional[HedgePolicy] = None
+    ) -> httpx.Response:
+        """Run ``send`` under the governor and return its last response.
+
+        Idempotent calls with a ``hedge`` policy send a backup request when
+        an attempt is slower than the policy's delay. Raises
+        UpstreamUnavailable when the breaker is open or Retry-After is
+        longer than we are willing to wait, and the last transport error when
+        retries run out.
+        """
+        self.budget.deposit()
+        metrics.incr(f"{self.name}.calls")
+        if hedge is not None and idempotent:
+            hedge.budget.deposit()
+        else:
+            hedge = None
+        for attempt in range(self.max_attempts):
+            last_attempt = attempt == self.max_attempts - 1
+            try:
+                if hedge is not None:
+                    response = await self._hedged_attempt(send, hedge)
+                else:
+                    response = await self._attempt(send)
+            except httpx.HTTPError as e:
+                retryable = idempotent or isinstance(e, UNSENT_ERRORS)
+                if last_attempt or not retryable or not self.budget.withdraw():
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                status = response.status_code
+                if status not in THROTTLE_STATUSES and status not in RETRY_STATUSES:
+                    return response
+                # A throttled request was not processed, so it is safe to repeat
+                retryable = idempotent or status in THROTTLE_STATUSES
+                if last_attempt or not retryable or not self.budget.withdraw():
+                    return response
+                delay = self._backoff(attempt)
+                await response.aclose()
+            metrics.incr(f"{self.name}.retries")
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
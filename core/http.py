@@ -0,0 +1,7 @@
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
@@ -0,0 +1,51 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """In-process counters and timing summaries, served from /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._observations: Dict[str, Dict[str, float]] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._observations.get(name)
+            if summary is None:
+                self._observations[name] = {"count": 1, "sum": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["max"] = max(summary["max"], value)
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "observations": {name: dict(summary) for name, summary in self._observations.items()}
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+            self._gauges.clear()
+
+
+metrics = Metrics()
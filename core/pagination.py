@@ -0,0 +1,72 @@
+import os
+import json
+import base64
+import hashlib
+from typing import AsyncIterator, Iterable, List, Optional
+from fastapi import HTTPException
+
+# Page size for list endpoints backed by keyset pagination
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", 100))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", 1000))
+
+def query_fingerprint(**params) -> str:
+    """Short stable hash of the query a cursor belongs to"""
+    normalized = json.dumps({name: value for name, value in params.items() if value is not None}, sort_keys=True)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+def encode_cursor(payload: dict) -> str:
+    """Encode a cursor payload as an opaque URL-safe token"""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, fingerprint: str) -> dict:
+    """Decode a cursor and check it belongs to the same query"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(payload, dict) or payload.get("q") != fingerprint:
+        raise HTTPException(status_code=400, detail="Cursor does not match the query parameters")
+    return payload
+
+def keyset_after(cursor: Optional[str], fingerprint: str) -> Optional[str]:
+    """Key to resume after from a keyset cursor, None for the first page"""
+    return decode_cursor(cursor, fingerprint).get("k") if cursor else None
+
+def keyset_cursor(fingerprint: str, after: Optional[str]) -> Optional[str]:
+    """Cursor for the page after key ``after``, None when there is no next page"""
+    return encode_cursor({"q": fingerprint, "k": after}) if after is not None else None
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Columns from a comma separated ``fields`` parameter, rejecting unknown ones"""
+    if not fields:
+        return None
+    allowed = set(allowed)
+    columns = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in columns if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    return columns
+
+async def _chain_rows(first: dict, rows: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    yield first
+    async for row in rows:
+        yield row
+
+async def _no_rows() -> AsyncIterator[dict]:
+    return
+    yield
+
+async def prime_rows(rows: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    """Fetch the first row now, so a failing first page raises before a stream starts"""
+    try:
+        first = await rows.__anext__()
+    except StopAsyncIteration:
+        return _no_rows()
+    return _chain_rows(first, rows)
+
+async def ndjson_rows(rows: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode rows as NDJSON, one line per row, as they arrive"""
+    async for row in rows:
+        yield json.dumps(row, default=str).encode() + b"\n"
@@ -1,18 +1,88 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from core.config import settings
+from core.metrics import metrics
+
+# Password hashing pool. bcrypt releases the GIL, so threads hash in parallel.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 32))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
+class PasswordPoolFull(Exception):
+    """Raised when the password hashing queue is at its depth limit"""
+
+
+class PasswordHashPool:
+    """Bounded thread pool for bcrypt work off the event loop.
+
+    At most ``workers`` hashes run at once and at most ``max_queue`` more
+    wait; beyond that calls fail fast with PasswordPoolFull instead of
+    piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_queue: int, name: str = "password_pool"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.name = name
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _report(self):
+        metrics.gauge(f"{self.name}.pending", self.pending)
+        metrics.gauge(f"{self.name}.saturation", self.pending / (self.workers + self.max_queue))
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        if self.pending >= self.workers + self.max_queue:
+            metrics.incr(f"{self.name}.rejected")
+            raise PasswordPoolFull("Password hashing queue is full")
+        self.pending += 1
+        metrics.incr(f"{self.name}.submitted")
+        self._report()
+        queued_at = time.perf_counter()
+
+        def timed_call():
+            started = time.perf_counter()
+            metrics.observe(f"{self.name}.queue_wait", started - queued_at)
+            try:
+                return fn(*args)
+            finally:
+                metrics.observe(f"{self.name}.duration", time.perf_counter() - started)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, timed_call)
+        finally:
+            self.pending -= 1
+            self._report()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash on the password pool"""
+    return await password_pool.run(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    """Hash a password on the password pool"""
+    return await password_pool.run(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
@@ -0,0 +1,39 @@
+import json
+from typing import Any, List
+
+from fastapi import Response
+from pydantic import BaseModel
+
+# orjson is optional; the standard library encoder is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON bytes for plain data, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
+
+
+def json_array(parts: List[bytes]) -> bytes:
+    """JSON array from already serialized elements"""
+    return b"[" + b",".join(parts) + b"]"
+
+
+class RawJSONResponse(Response):
+    """JSON response whose body is already serialized bytes.
+
+    Returning one from a route skips FastAPI's response_model validation
+    and encoding; the route's response_model still documents the schema.
+    """
+
+    media_type = "application/json"
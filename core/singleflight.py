@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from core.metrics import metrics
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task.
+
+    Every caller awaits the same task, so results and exceptions reach all
+    of them. A cancelled caller only stops waiting; the shared call is
+    cancelled once no callers are left waiting on it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task, key=key: self._finish(key, task))
+            metrics.incr(f"singleflight.{self.name}.calls")
+        else:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done() and call.waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finish(self, key: str, task: asyncio.Task):
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            del self._calls[key]
+        if task.cancelled():
+            metrics.incr(f"singleflight.{self.name}.cancelled")
+        elif task.exception() is not None:
+            # Retrieved here so an error nobody awaited isn't logged as lost
+            metrics.incr(f"singleflight.{self.name}.errors")
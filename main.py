@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.user.api import router as user_router
@@ -7,6 +8,14 @@ from app.questions.api import router as questions_router
 from app.responses.api import router as responses_router
 from app.property.api import router as property_router
 from app.property import wishlist_router, cart_router
+from app.property.clients import start_mls_client, close_mls_client
+from app.property.replica import start_replica, stop_replica
+from app.property.search_index import start_search_index, stop_search_index
+from app.auth.deps import start_auth, stop_auth
+from core.database import close_database
+from core.security import password_pool
+from core.metrics import metrics
+from core.compression import CompressionMiddleware, compressed_cache
 
 # Try to import settings, but handle missing config gracefully
 try:
@@ -15,12 +24,33 @@ try:
 except Exception:
     CORS_ORIGINS = ["*"]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled MLS client for the lifetime of the app
+    await start_mls_client()
+    await start_replica()
+    await start_search_index()
+    await start_auth()
+    try:
+        yield
+    finally:
+        await stop_auth()
+        await stop_search_index()
+        await stop_replica()
+        await close_mls_client()
+        await close_database()
+        password_pool.shutdown()
+
 app = FastAPI(
     title="TRP Backend API",
     description="Toronto Regional Properties Backend API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Compress JSON responses, reusing compressed bodies of cached payloads
+app.add_middleware(CompressionMiddleware, cache=compressed_cache)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +58,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers with new modular structure
@@ -47,6 +78,10 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))